@@ -50,7 +50,8 @@ CREATE TABLE calls_for_service (
     location_type_code VARCHAR(50),
     city TEXT,
     latitude FLOAT,
-    longitude FLOAT
+    longitude FLOAT,
+    grid_cell INT -- 250 m cell id over the NYC bounding box (see src/spatial/grid.py)
 ) PARTITION BY RANGE (incident_date);
 
 -- Create partitions for 20 years (2004-2025)
@@ -77,10 +78,16 @@ CREATE TABLE calls_2021 PARTITION OF calls_for_service FOR VALUES FROM ('2021-01
 CREATE TABLE calls_2022 PARTITION OF calls_for_service FOR VALUES FROM ('2022-01-01') TO ('2023-01-01');
 CREATE TABLE calls_2023 PARTITION OF calls_for_service FOR VALUES FROM ('2023-01-01') TO ('2024-01-01');
 CREATE TABLE calls_2024 PARTITION OF calls_for_service FOR VALUES FROM ('2024-01-01') TO ('2025-01-01');
--- Catch-all for data outside range
+-- Catch-all for data outside range.
+-- The loader creates missing yearly partitions (calls_YYYY) automatically and
+-- moves any matching rows out of calls_default when it does.
 CREATE TABLE calls_default PARTITION OF calls_for_service DEFAULT;
 
 -- Indices on the main table (Propagates to partitions)
 CREATE INDEX idx_incident_date ON calls_for_service (incident_date);
+-- Alternative for date-ordered loads (`--brin` on the load step): a BRIN index is
+-- orders of magnitude smaller and cheap to maintain for time-range scans.
+-- CREATE INDEX idx_incident_date_brin ON calls_for_service USING BRIN (incident_date);
 CREATE INDEX idx_complaint_type ON calls_for_service (complaint_type);
 CREATE INDEX idx_borough ON calls_for_service (borough);
+CREATE INDEX idx_grid_cell ON calls_for_service (grid_cell);
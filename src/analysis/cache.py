@@ -0,0 +1,184 @@
+import os
+import re
+import glob
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "data/cache"
+MAX_BYTES = int(os.getenv("CRIMECAST_CACHE_MAX_BYTES", 4 * 1024 ** 3))
+# Bumped by `invalidate()` after every load; part of every cache key
+WATERMARK_FILE = "WATERMARK"
+# Serializes eviction / invalidation across the stage threads of one process
+_lock = threading.Lock()
+
+def normalize_query(query):
+    """Collapses whitespace so formatting differences don't change the cache key."""
+    return re.sub(r"\s+", " ", query).strip()
+
+class QueryCache:
+    """On-disk cache of SQL query results as uncompressed Feather (Arrow IPC) files.
+
+    Entries are keyed by the normalized query text, its parameters, the
+    database they came from and the table version, and memory-mapped on
+    read. The least recently used entries are evicted once the cache grows
+    past `max_bytes`. The loader calls `invalidate()` after every load, which
+    drops all entries and bumps the load watermark that versions the table.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.feather")
+
+    @staticmethod
+    def _sqlite_path(conn):
+        files = {name: path for _, name, path in conn.execute("PRAGMA database_list")}
+        return files.get("main") or None
+
+    @classmethod
+    def database_identity(cls, conn):
+        """Identifies the database behind `conn`: the SQLite file, or the Postgres server and database."""
+        if isinstance(conn, sqlite3.Connection):
+            path = cls._sqlite_path(conn)
+            return f"sqlite:{os.path.abspath(path) if path else ':memory:'}"
+        dsn = conn.get_dsn_parameters()
+        return f"postgres:{dsn.get('user')}@{dsn.get('host')}:{dsn.get('port')}/{dsn.get('dbname')}"
+
+    @classmethod
+    def _table_stats(cls, conn):
+        """Cheap change markers for calls_for_service, without scanning it.
+
+        SQLite: size and mtime of the database file (and its WAL). Postgres:
+        per-partition relfilenode (changes on TRUNCATE) and the cumulative
+        insert/update/delete counters from pg_stat_user_tables.
+        """
+        if isinstance(conn, sqlite3.Connection):
+            path = cls._sqlite_path(conn)
+            if path is None:
+                return "memory"
+            stats = []
+            for file in (path, f"{path}-wal"):
+                if os.path.exists(file):
+                    st = os.stat(file)
+                    stats.append(f"{st.st_size}:{st.st_mtime_ns}")
+            return ",".join(stats)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT c.oid, c.relfilenode, COALESCE(s.n_tup_ins + s.n_tup_upd + s.n_tup_del, 0)
+                FROM pg_class c
+                LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+                WHERE c.oid = 'calls_for_service'::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'calls_for_service'::regclass)
+                ORDER BY c.oid
+            """)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        return ",".join(":".join(str(v) for v in row) for row in rows)
+
+    def table_version(self, conn):
+        """Fingerprints calls_for_service: database identity, load watermark and table stats.
+
+        The watermark is bumped by `invalidate()`; the stats catch loads and
+        databases the watermark knows nothing about. None of it scans the table.
+        """
+        watermark = os.path.join(self.cache_dir, WATERMARK_FILE)
+        try:
+            with open(watermark) as f:
+                mark = f.read().strip()
+        except FileNotFoundError:
+            mark = ""
+        return f"{self.database_identity(conn)}|watermark:{mark}|stats:{self._table_stats(conn)}"
+
+    def key(self, query, params=None, version=""):
+        payload = "\x1f".join([normalize_query(query), repr(list(params or [])), version])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached DataFrame for `key`, or None on a miss."""
+        import pyarrow.feather as feather
+
+        path = self._path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            os.utime(path)  # Marks the entry as recently used for LRU eviction
+        except (FileNotFoundError, OSError):
+            return None
+        return table.to_pandas()
+
+    def put(self, key, df):
+        """Stores `df` under `key`, then evicts old entries if over budget."""
+        import pyarrow.feather as feather
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Uncompressed so reads can be memory-mapped without decoding
+            feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Could not cache query result: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in `max_bytes`."""
+        with _lock:
+            entries = []
+            for path in glob.glob(os.path.join(self.cache_dir, "*.feather")):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def invalidate(self):
+        """Drops every entry and bumps the load watermark."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with _lock:
+            for path in glob.glob(os.path.join(self.cache_dir, "*.feather")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with open(os.path.join(self.cache_dir, WATERMARK_FILE), "w") as f:
+                f.write(f"{time.time_ns()}-{os.getpid()}")
+        print("Query cache invalidated.")
+
+    def read_sql(self, query, conn, params=None):
+        """pd.read_sql with the result served from / stored in the cache."""
+        key = self.key(query, params, self.table_version(conn))
+        df = self.get(key)
+        if df is not None:
+            logger.info(f"Query cache hit ({len(df)} rows).")
+            return df
+        df = pd.read_sql(query, conn, params=params or None)
+        self.put(key, df)
+        return df
+
+def read_sql(query, conn, params=None, use_cache=True):
+    """Runs `query`, going through the default QueryCache unless `use_cache` is False."""
+    if not use_cache:
+        return pd.read_sql(query, conn, params=params or None)
+    return QueryCache().read_sql(query, conn, params)
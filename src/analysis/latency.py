@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+SKETCH_DIR = "data/output/latency"
+
+# Slice dimensions every sketch is kept per
+DIMENSIONS = ['precinct_id', 'borough', 'complaint_type', 'hour']
+# Metric -> (start timestamp column, end timestamp column)
+METRICS = {
+    'dispatch': ('created_date', 'arrival_time'),   # call created -> unit on scene
+    'on_scene': ('arrival_time', 'closing_time'),   # unit on scene -> job closed
+}
+MIN_SECONDS = 1.0
+MAX_SECONDS = 7 * 24 * 3600.0  # Longer durations are treated as data errors
+
+def compute_durations(df):
+    """Returns the slice dimensions plus one duration column (seconds) per metric.
+
+    Durations that are missing, negative or longer than MAX_SECONDS are NaN.
+    """
+    created = pd.to_datetime(df['created_date'], errors='coerce') if 'created_date' in df.columns else None
+    out = pd.DataFrame(index=df.index)
+    for dim in ['precinct_id', 'borough', 'complaint_type']:
+        out[dim] = df[dim] if dim in df.columns else None
+    if created is not None:
+        out['hour'] = created.dt.hour
+    else:
+        out['hour'] = pd.to_numeric(df['incident_time'].astype(str).str[:2], errors='coerce')
+
+    for metric, (start_col, end_col) in METRICS.items():
+        if start_col not in df.columns or end_col not in df.columns:
+            out[metric] = np.nan
+            continue
+        start = pd.to_datetime(df[start_col], errors='coerce')
+        end = pd.to_datetime(df[end_col], errors='coerce')
+        seconds = (end - start).dt.total_seconds()
+        out[metric] = seconds.where((seconds > 0) & (seconds <= MAX_SECONDS))
+    return out
+
+class LatencySketches:
+    """Mergeable quantile sketches of response latency per precinct/borough/type/hour.
+
+    Each sketch is a log-bucketed histogram (the DDSketch scheme): bucket i
+    covers (gamma^(i-1), gamma^i], so every quantile is returned within
+    `relative_accuracy` of the true value. Sketches are stored sparsely as
+    (dimensions, bucket, count) rows; merging is adding counts, so they can
+    be updated one loaded partition at a time, and any slice is answered by
+    summing the matching rows instead of a full-table percentile query.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.counts = {metric: self._empty() for metric in METRICS}
+
+    @staticmethod
+    def _empty():
+        return pd.DataFrame({
+            'precinct_id': pd.Series(dtype='float64'),
+            'borough': pd.Series(dtype='object'),
+            'complaint_type': pd.Series(dtype='object'),
+            'hour': pd.Series(dtype='float64'),
+            'bucket': pd.Series(dtype='int16'),
+            'count': pd.Series(dtype='int64'),
+        })
+
+    def bucket(self, seconds):
+        """Vectorized bucket index for durations in seconds."""
+        values = np.clip(np.asarray(seconds, dtype=float), MIN_SECONDS, MAX_SECONDS)
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int16)
+
+    def bucket_value(self, buckets):
+        """Representative duration of each bucket (within relative_accuracy of any member)."""
+        return 2 * self.gamma ** np.asarray(buckets, dtype=float) / (self.gamma + 1)
+
+    def _combine(self, metric, new):
+        merged = pd.concat([self.counts[metric], new], ignore_index=True)
+        self.counts[metric] = (
+            merged.groupby(DIMENSIONS + ['bucket'], dropna=False, sort=False, observed=True)['count']
+            .sum().reset_index()
+        )
+
+    def update(self, df):
+        """Adds the calls in a cleaned frame (e.g. one loaded partition) to the sketches."""
+        durations = compute_durations(df)
+        for metric in METRICS:
+            valid = durations[durations[metric].notna()]
+            if valid.empty:
+                continue
+            batch = valid[DIMENSIONS].copy()
+            batch['bucket'] = self.bucket(valid[metric].to_numpy())
+            new = batch.groupby(DIMENSIONS + ['bucket'], dropna=False, sort=False, observed=True).size()
+            self._combine(metric, new.reset_index(name='count'))
+        return self
+
+    def merge(self, other):
+        """Merges another set of sketches built with the same accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for metric in METRICS:
+            self._combine(metric, other.counts[metric])
+        return self
+
+    def _slice(self, metric, filters):
+        counts = self.counts[metric]
+        mask = np.ones(len(counts), dtype=bool)
+        for dim, value in filters.items():
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dim}'; expected one of {DIMENSIONS}")
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= counts[dim].isin(list(values)).to_numpy()
+        return counts.loc[mask, ['bucket', 'count']].groupby('bucket')['count'].sum().sort_index()
+
+    def quantiles(self, metric='dispatch', q=(0.5, 0.9, 0.99), **filters):
+        """Returns {quantile: seconds} for the slice given by dimension filters.
+
+        Filters take a value or a list, e.g. quantiles('dispatch', borough='BRONX', hour=[0, 1, 2]).
+        Returns None values for an empty slice.
+        """
+        hist = self._slice(metric, filters)
+        total = hist.sum()
+        if total == 0:
+            return {quantile: None for quantile in q}
+        cumulative = hist.to_numpy().cumsum()
+        ranks = np.asarray(q, dtype=float) * (total - 1)
+        idx = np.searchsorted(cumulative, ranks, side='right')
+        values = self.bucket_value(hist.index.to_numpy()[np.minimum(idx, len(hist) - 1)])
+        return dict(zip(q, values.tolist()))
+
+    def count(self, metric='dispatch', **filters):
+        return int(self._slice(metric, filters).sum())
+
+    def save(self, path=SKETCH_DIR):
+        os.makedirs(path, exist_ok=True)
+        for metric, counts in self.counts.items():
+            counts.to_parquet(os.path.join(path, f"{metric}.parquet"), index=False)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"relative_accuracy": self.relative_accuracy, "dimensions": DIMENSIONS}, f)
+
+    @classmethod
+    def load(cls, path=SKETCH_DIR):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        sketches = cls(meta["relative_accuracy"])
+        for metric in METRICS:
+            file = os.path.join(path, f"{metric}.parquet")
+            if os.path.exists(file):
+                sketches.counts[metric] = pd.read_parquet(file)
+        return sketches
+
+def build_from_parquet(processed_dir="data/processed", path=SKETCH_DIR):
+    """Rebuilds the sketches from the processed Parquet files, one file at a time."""
+    import glob
+    import pyarrow.parquet as pq
+
+    sketches = LatencySketches()
+    columns = DIMENSIONS[:-1] + ['created_date', 'arrival_time', 'closing_time', 'incident_time']
+    for file in sorted(glob.glob(os.path.join(processed_dir, "*.parquet"))):
+        print(f"Sketching {file}...")
+        available = pq.read_schema(file).names
+        df = pd.read_parquet(file, columns=[c for c in columns if c in available])
+        sketches.update(df)
+    sketches.save(path)
+    return sketches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response latency percentiles from the pre-built sketches")
+    parser.add_argument("--metric", choices=list(METRICS), default="dispatch")
+    parser.add_argument("--borough", nargs="+")
+    parser.add_argument("--precinct", nargs="+", type=float)
+    parser.add_argument("--complaint_type", nargs="+")
+    parser.add_argument("--hour", nargs="+", type=float)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild sketches from data/processed first")
+    parser.add_argument("--path", default=SKETCH_DIR)
+    args = parser.parse_args()
+
+    sketches = build_from_parquet(path=args.path) if args.rebuild else LatencySketches.load(args.path)
+    start = time.perf_counter()
+    result = sketches.quantiles(
+        args.metric, borough=args.borough, precinct_id=args.precinct,
+        complaint_type=args.complaint_type, hour=args.hour,
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for quantile, seconds in result.items():
+        value = "n/a" if seconds is None else f"{seconds / 60:.1f} min"
+        print(f"p{quantile * 100:g}: {value}")
+    print(f"({args.metric}, answered in {elapsed_ms:.1f} ms)")
@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
 import logging
-from src.etl.loader import get_connection
+from src.etl.loader import get_connection, date_range_clause
+from src import instrumentation
+from src.analysis import cache, sampling
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AssociationRuleMiner:
@@ -12,16 +13,69 @@ class AssociationRuleMiner:
         self.min_confidence = min_confidence
         self.rules_df = pd.DataFrame()
 
-    def load_transactions_df(self):
-        """Loads data and prepares a one-hot encoded DataFrame for mining."""
-        query = """
+    def _read_transactions(self, backend='db', start_date=None, end_date=None, use_cache=True,
+                           sample_fraction=None, sample_size=None, seed=sampling.DEFAULT_SEED):
+        """Reads the columns needed for transactions from the DB or the Parquet files."""
+        sampling.validate_fraction(sample_fraction)
+        sampled = sample_fraction is not None or sample_size is not None
+        columns = ['incident_date', 'incident_time', 'precinct_id', 'complaint_type']
+        if backend == 'parquet':
+            from src.analysis.query import ParquetQueryEngine
+            filters = []
+            if start_date is not None:
+                filters.append(('incident_date', '>=', start_date))
+            if end_date is not None:
+                filters.append(('incident_date', '<', end_date))
+            engine = ParquetQueryEngine()
+            if sampled:
+                if sample_size is not None and sample_fraction is None:
+                    sample_fraction = sampling.fraction_for_size(engine.count(filters=filters), sample_size)
+                df = sampling.sample_frame(engine.scan(columns=columns + ['cad_evnt_id'], filters=filters), sample_fraction, seed)
+                df = df[columns].reset_index(drop=True)
+                sampling.sample_report(df, lambda dim: sampling.parquet_distribution(engine, dim, filters))
+            else:
+                df = engine.scan(columns=columns, filters=filters)
+            # Match the DB's DATE values so transaction ids look the same
+            df['incident_date'] = pd.to_datetime(df['incident_date']).dt.date
+            return df
+
+        conn = get_connection()
+        date_conditions, params = date_range_clause(conn, start_date, end_date)
+        if sample_size is not None and sample_fraction is None:
+            sample_fraction = sampling.fraction_for_size(sampling.count_rows(conn, date_conditions, params), sample_size)
+        tablesample, sample_conditions, sample_params = sampling.sample_clause(conn, sample_fraction, seed)
+        conditions = date_conditions + sample_conditions
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
             SELECT incident_date, incident_time, precinct_id, complaint_type 
-            FROM calls_for_service 
+            FROM calls_for_service {tablesample}
+            {where_clause}
+        """
+        try:
+            df = cache.read_sql(query, conn, params + sample_params, use_cache=use_cache)
+            if sampled:
+                sampling.sample_report(df, lambda dim: sampling.table_distribution(conn, dim, date_conditions, params, use_cache))
+            return df
+        finally:
+            conn.close()
+
+    def load_transactions_df(self, backend='db', start_date=None, end_date=None, use_cache=True,
+                             sample_fraction=None, sample_size=None, seed=sampling.DEFAULT_SEED):
+        """Loads data and prepares a one-hot encoded DataFrame for mining.
+
+        backend='parquet' reads the processed Parquet files instead of the DB.
+        `start_date` / `end_date` restrict incident_date to [start_date, end_date).
+        `use_cache=False` bypasses the local query cache. `sample_fraction` /
+        `sample_size` mine a reproducible in-database sample (see
+        src.analysis.sampling) instead of the whole table.
         """
-        conn = get_connection()
         try:
             logger.info("Loading data for mining...")
-            df = pd.read_sql(query, conn)
+            with instrumentation.track("load_transactions", backend=backend, sample_fraction=sample_fraction) as metrics:
+                df = self._read_transactions(
+                    backend, start_date, end_date, use_cache, sample_fraction, sample_size, seed
+                )
+                metrics.add_rows(len(df))
             
             # Create transaction ID
             try:
@@ -52,13 +106,15 @@ class AssociationRuleMiner:
         except Exception as e:
             logger.error(f"Error loading transactions: {e}")
             return None
-        finally:
-            conn.close()
 
     def mine_rules(self, basket):
         """Mines rules using matrix multiplication for co-occurrence."""
         logger.info("Calculating co-occurrence matrix...")
-        
+        with instrumentation.track("mine_rules") as metrics:
+            metrics.add_rows(len(basket))
+            return self._mine_rules(basket)
+
+    def _mine_rules(self, basket):
         # Support for single items (diagonal of co-occurrence if we treated it right, but simpler:)
         n_transactions = len(basket)
         item_support = basket.sum() / n_transactions
@@ -131,4 +187,4 @@ class AssociationRuleMiner:
         return df_rules
 
 if __name__ == "__main__":
-    pass
+    logging.basicConfig(level=logging.INFO)
@@ -1,23 +1,45 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.linear_model import Ridge, Lasso, LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import mean_squared_error, accuracy_score, classification_report
-import joblib
 import os
-from src.etl.loader import get_connection
+from src.etl.loader import get_connection, date_range_clause
+from src import instrumentation
+from src.analysis import cache, sampling
+
+HIGH_PRIORITY = ['MURDER', 'RAPE', 'ROBBERY', 'FELONY ASSAULT', 'BURGLARY', 'GRAND LARCENY', 'GRAND LARCENY OF MOTOR VEHICLE']
+
+def add_priority_target(df):
+    """Adds the binary `is_high_priority` classification target."""
+    df['is_high_priority'] = df['complaint_type'].apply(lambda x: 1 if any(c in str(x).upper() for c in HIGH_PRIORITY) else 0)
+    return df
 
 class IncidentPredictor:
     def __init__(self):
         self.model = None
         self.pipeline = None
+        self.sample_report = None
         
-    def fetch_data(self, limit=100000):
-        """Fetches data from Postgres/SQLite for ML training."""
+    def fetch_data(self, limit=100000, backend='db', start_date=None, end_date=None, use_cache=True,
+                   sample_fraction=None, sample_size=None, seed=sampling.DEFAULT_SEED):
+        """Fetches data for ML training.
+
+        backend='db' queries Postgres/SQLite; backend='parquet' reads the
+        processed Parquet files directly, with no database. `start_date` /
+        `end_date` restrict incident_date to [start_date, end_date), which
+        lets Postgres skip partitions outside the range. DB results are served
+        from the local query cache unless `use_cache` is False.
+
+        `sample_fraction` (or `sample_size` rows) samples inside the database,
+        reproducibly for a given `seed`, instead of taking the first `limit`
+        rows; the sample's borough / year / complaint type mix is then
+        compared with the full table's and stored in `self.sample_report`.
+        """
+        sampling.validate_fraction(sample_fraction)
+        if backend == 'parquet':
+            with instrumentation.track("fetch_data", backend=backend, sample_fraction=sample_fraction) as metrics:
+                df = self._fetch_parquet(limit, start_date, end_date, sample_fraction, sample_size, seed)
+                metrics.add_rows(len(df))
+            return add_priority_target(df)
+
         conn = get_connection()
         
         # Adjust query for SQLite (no EXTRACT)
@@ -25,7 +47,15 @@ class IncidentPredictor:
         is_sqlite = isinstance(conn, sqlite3.Connection)
         
         limit_clause = f"LIMIT {limit}" if limit else ""
-        
+        date_conditions, params = date_range_clause(conn, start_date, end_date)
+        conditions = ["latitude IS NOT NULL", "longitude IS NOT NULL"] + date_conditions
+        sampled = sample_fraction is not None or sample_size is not None
+
+        if sample_size is not None and sample_fraction is None:
+            sample_fraction = sampling.fraction_for_size(sampling.count_rows(conn, conditions, params), sample_size)
+        tablesample, sample_conditions, sample_params = sampling.sample_clause(conn, sample_fraction, seed)
+        where_clause = " AND ".join(conditions + sample_conditions)
+
         if is_sqlite:
             # Use substr for hour extraction (HH:MM:SS -> HH)
             query = f"""
@@ -38,8 +68,8 @@ class IncidentPredictor:
                     latitude, 
                     longitude,
                     complaint_type
-                FROM calls_for_service
-                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                FROM calls_for_service {tablesample}
+                WHERE {where_clause}
                 {limit_clause}
             """
         else:
@@ -53,20 +83,55 @@ class IncidentPredictor:
                     latitude, 
                     longitude,
                     complaint_type
-                FROM calls_for_service
-                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                FROM calls_for_service {tablesample}
+                WHERE {where_clause}
                 {limit_clause}
             """
 
         try:
-            df = pd.read_sql(query, conn)
+            with instrumentation.track("fetch_data", sample_fraction=sample_fraction) as metrics:
+                df = cache.read_sql(query, conn, params + sample_params, use_cache=use_cache)
+                metrics.add_rows(len(df))
+            if sampled:
+                self.sample_report = sampling.sample_report(
+                    df, lambda dim: sampling.table_distribution(conn, dim, conditions, params, use_cache)
+                )
             # Create target for classification (Priority)
-            high_priority = ['MURDER', 'RAPE', 'ROBBERY', 'FELONY ASSAULT', 'BURGLARY', 'GRAND LARCENY', 'GRAND LARCENY OF MOTOR VEHICLE']
-            df['is_high_priority'] = df['complaint_type'].apply(lambda x: 1 if any(c in str(x).upper() for c in high_priority) else 0)
-            return df
+            return add_priority_target(df)
         finally:
             conn.close()
 
+    def _fetch_parquet(self, limit=None, start_date=None, end_date=None,
+                       sample_fraction=None, sample_size=None, seed=sampling.DEFAULT_SEED):
+        """Builds the same frame as the SQL queries from the processed Parquet files."""
+        from src.analysis.query import ParquetQueryEngine
+
+        filters = [('latitude', 'not null', None), ('longitude', 'not null', None)]
+        if start_date is not None:
+            filters.append(('incident_date', '>=', start_date))
+        if end_date is not None:
+            filters.append(('incident_date', '<', end_date))
+        engine = ParquetQueryEngine()
+        columns = ['incident_date', 'incident_time', 'precinct_id', 'borough', 'latitude', 'longitude', 'complaint_type']
+        sampled = sample_fraction is not None or sample_size is not None
+        if sampled:
+            if sample_size is not None and sample_fraction is None:
+                sample_fraction = sampling.fraction_for_size(engine.count(filters=filters), sample_size)
+            df = sampling.sample_frame(engine.scan(columns=columns + ['cad_evnt_id'], filters=filters), sample_fraction, seed)
+            df = df.head(limit) if limit else df
+            self.sample_report = sampling.sample_report(
+                df, lambda dim: sampling.parquet_distribution(engine, dim, filters)
+            )
+        else:
+            df = engine.scan(columns=columns, filters=filters, limit=limit)
+        df = df.reset_index(drop=True)
+        dates = pd.to_datetime(df['incident_date'])
+        df['incident_date'] = dates.dt.normalize()
+        df['hour'] = pd.to_numeric(df['incident_time'].astype(str).str[:2], errors='coerce')
+        # 0=Sunday, matching Postgres DOW and SQLite strftime('%w')
+        df['day_of_week'] = (dates.dt.dayofweek + 1) % 7
+        return df[['incident_date', 'hour', 'day_of_week', 'precinct_id', 'borough', 'latitude', 'longitude', 'complaint_type']]
+
     def build_regression_pipeline(self, regularization='ridge', alpha=1.0):
         """Builds a regression pipeline to predict hourly incident volume."""
         # Feature Engineering: 
@@ -75,6 +140,14 @@ class IncidentPredictor:
 
     def train_classification_model(self, df):
         """Trains a classifier to predict High Priority crimes."""
+        # sklearn is imported per method so fetch-only callers stay lightweight
+        import joblib
+        from sklearn.model_selection import train_test_split
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.preprocessing import StandardScaler, OneHotEncoder
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.metrics import accuracy_score, classification_report
         
         X = df[['hour', 'day_of_week', 'precinct_id', 'borough', 'latitude', 'longitude']]
         y = df['is_high_priority']
@@ -103,7 +176,9 @@ class IncidentPredictor:
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         print("Training Classification Model...")
-        self.pipeline.fit(X_train, y_train)
+        with instrumentation.track("train_classifier") as metrics:
+            self.pipeline.fit(X_train, y_train)
+            metrics.add_rows(len(X_train))
         
         y_pred = self.pipeline.predict(X_test)
         print("Model Accuracy:", accuracy_score(y_test, y_pred))
@@ -115,6 +190,14 @@ class IncidentPredictor:
         
     def train_volume_regression(self, df):
         """Predicts incident volume per precinct/hour."""
+        import joblib
+        from sklearn.model_selection import train_test_split
+        from sklearn.linear_model import Ridge
+        from sklearn.preprocessing import OneHotEncoder
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.metrics import mean_squared_error
+
         # Debug
         print("Data Frame Info:")
         print(df.info())
@@ -145,12 +228,15 @@ class IncidentPredictor:
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         print("Training Regression Model (Ridge)...")
-        self.pipeline.fit(X_train, y_train)
+        with instrumentation.track("train_regressor") as metrics:
+            self.pipeline.fit(X_train, y_train)
+            metrics.add_rows(len(X_train))
         
         y_pred = self.pipeline.predict(X_test)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
         print(f"RMSE: {rmse}")
         
+        os.makedirs("models", exist_ok=True)
         joblib.dump(self.pipeline, "models/volume_regressor.joblib")
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+import os
+import re
+import glob
+import argparse
+import pandas as pd
+
+PROCESSED_DIR = "data/processed"
+
+# Filters are (column, op, value) tuples, combined with AND
+OPERATORS = ['==', '!=', '>=', '<=', '>', '<', 'in', 'not in', 'is null', 'not null']
+
+class ParquetQueryEngine:
+    """Filter / group-by / count queries directly over the processed Parquet files.
+
+    Built on Arrow datasets: only the requested columns are read (projection
+    pushdown), filters are checked against Parquet row-group statistics before
+    decoding (predicate pushdown), and scans run on all cores.
+    """
+
+    def __init__(self, path=PROCESSED_DIR):
+        self.path = path
+        self._dataset = None
+
+    @property
+    def dataset(self):
+        if self._dataset is None:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            import pyarrow.parquet as pq
+
+            files = sorted(glob.glob(os.path.join(self.path, "*.parquet")))
+            if not files:
+                raise FileNotFoundError(f"No parquet files found in {self.path}")
+            # Files are cleaned independently, so e.g. an all-null column can be
+            # typed differently per year; unify to a common schema first.
+            try:
+                schema = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options="permissive")
+            except (pa.ArrowInvalid, TypeError):
+                schema = None
+            self._dataset = ds.dataset(files, format="parquet", schema=schema)
+        return self._dataset
+
+    @property
+    def columns(self):
+        return self.dataset.schema.names
+
+    def _scalar(self, column, value):
+        """Converts a filter value to the column's Arrow type (e.g. '2023-01-01' for timestamps)."""
+        import pyarrow as pa
+
+        field_type = self.dataset.schema.field(column).type
+        if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+            value = pd.Timestamp(value)
+            if pa.types.is_date(field_type):
+                value = value.date()
+        return pa.scalar(value).cast(field_type)
+
+    def expression(self, filters):
+        """Builds an Arrow filter expression from (column, op, value) tuples."""
+        import pyarrow.dataset as ds
+
+        expr = None
+        for column, op, value in filters or []:
+            field = ds.field(column)
+            if op == 'is null':
+                term = field.is_null()
+            elif op == 'not null':
+                term = field.is_valid()
+            elif op in ('in', 'not in'):
+                import pyarrow as pa
+                values = [self._scalar(column, v) for v in value]
+                term = field.isin(pa.array([v.as_py() for v in values], type=self.dataset.schema.field(column).type))
+                if op == 'not in':
+                    term = ~term
+            elif op in OPERATORS:
+                scalar = self._scalar(column, value)
+                term = {
+                    '==': field == scalar, '!=': field != scalar,
+                    '>=': field >= scalar, '<=': field <= scalar,
+                    '>': field > scalar, '<': field < scalar,
+                }[op]
+            else:
+                raise ValueError(f"Unsupported operator '{op}'")
+            expr = term if expr is None else expr & term
+        return expr
+
+    def scan(self, columns=None, filters=None, limit=None):
+        """Returns the matching rows as a pandas DataFrame."""
+        expr = self.expression(filters)
+        if limit:
+            table = self.dataset.head(limit, columns=columns, filter=expr, use_threads=True)
+        else:
+            table = self.dataset.to_table(columns=columns, filter=expr, use_threads=True)
+        return table.to_pandas()
+
+    def count(self, group_by=None, filters=None):
+        """Counts matching rows, optionally per group. Returns an int or a DataFrame."""
+        expr = self.expression(filters)
+        if not group_by:
+            return self.dataset.count_rows(filter=expr)
+        result = self.aggregate(group_by, [([], 'count_all')], filters).rename(columns={'count_all': 'count'})
+        return result.sort_values('count', ascending=False, ignore_index=True)
+
+    def aggregate(self, group_by, aggregations, filters=None):
+        """Group-by aggregation, e.g. aggregations=[('latitude', 'mean'), ([], 'count_all')].
+
+        Only the key and aggregated columns are read.
+        """
+        needed = list(group_by)
+        for column, _ in aggregations:
+            if column and column not in needed:
+                needed.append(column)
+        table = self.dataset.to_table(columns=needed, filter=self.expression(filters), use_threads=True)
+        result = table.group_by(list(group_by)).aggregate(list(aggregations)).to_pandas()
+        return result.sort_values(list(group_by), ignore_index=True)
+
+def parse_filter(text):
+    """Parses 'column op value' strings, e.g. 'incident_date >= 2023-01-01' or 'borough in BRONX,QUEENS'."""
+    match = re.match(r"^\s*(\w+)\s+(not in|in|is null|not null|==|!=|>=|<=|>|<)\s*(.*?)\s*$", text)
+    if not match:
+        raise ValueError(f"Cannot parse filter '{text}'")
+    column, op, raw = match.groups()
+
+    def convert(v):
+        for cast in (int, float):
+            try:
+                return cast(v)
+            except ValueError:
+                pass
+        return v
+
+    if op in ('is null', 'not null'):
+        value = None
+    elif op in ('in', 'not in'):
+        value = [convert(v.strip()) for v in raw.split(',')]
+    else:
+        value = convert(raw)
+    return column, op, value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the processed Parquet dataset without a database")
+    parser.add_argument("command", choices=["count", "scan"], help="count rows (optionally grouped) or print rows")
+    parser.add_argument("--input", default=PROCESSED_DIR, help="Directory containing parquet files")
+    parser.add_argument("--where", action="append", default=[], help="Filter, e.g. \"borough == BRONX\" (repeatable)")
+    parser.add_argument("--group_by", nargs="+", help="Columns to group counts by")
+    parser.add_argument("--columns", nargs="+", help="Columns to return for scan")
+    parser.add_argument("--limit", type=int, default=20, help="Rows to return for scan")
+    parser.add_argument("--output", help="Write the result to this CSV file instead of printing")
+    args = parser.parse_args()
+
+    engine = ParquetQueryEngine(args.input)
+    filters = [parse_filter(w) for w in args.where]
+    if args.command == "count":
+        result = engine.count(args.group_by, filters)
+    else:
+        result = engine.scan(args.columns, filters, args.limit)
+
+    if not isinstance(result, pd.DataFrame):
+        print(result)
+    elif args.output:
+        result.to_csv(args.output, index=False)
+        print(f"Wrote {len(result)} rows to {args.output}")
+    else:
+        print(result.to_string(index=False))
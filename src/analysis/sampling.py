@@ -0,0 +1,122 @@
+import zlib
+import sqlite3
+import logging
+import pandas as pd
+from src.analysis import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEED = 42
+# Strata the sample's distribution is checked against
+STRATA = ['borough', 'year', 'complaint_type']
+SAMPLE_HASH = "crimecast_sample_hash"
+
+def _sample_hash(value, seed):
+    return zlib.crc32(f"{seed}:{value}".encode())
+
+def validate_fraction(fraction):
+    if fraction is not None and not 0 < fraction <= 1:
+        raise ValueError(f"Sample fraction must be in (0, 1], got {fraction}")
+    return fraction
+
+def sample_clause(conn, fraction, seed=DEFAULT_SEED, id_column="cad_evnt_id"):
+    """Builds an in-database filter keeping about `fraction` of the rows.
+
+    Returns (tablesample, conditions, params): `tablesample` goes right after
+    the table name, `conditions` into the WHERE clause. Postgres uses
+    TABLESAMPLE BERNOULLI ... REPEATABLE (seed); SQLite keeps rows whose
+    seeded CRC32 of `id_column` falls below the fraction. Both keep every row
+    with the same probability, so each borough / year / complaint type
+    stratum is represented in proportion to its size, and the same seed
+    returns the same sample.
+    """
+    validate_fraction(fraction)
+    if fraction is None or fraction >= 1:
+        return "", [], []
+    if isinstance(conn, sqlite3.Connection):
+        conn.create_function(SAMPLE_HASH, 2, _sample_hash, deterministic=True)
+        return "", [f"{SAMPLE_HASH}({id_column}, ?) < ?"], [int(seed), int(fraction * 2 ** 32)]
+    return f"TABLESAMPLE BERNOULLI ({fraction * 100:.6f}) REPEATABLE ({int(seed)})", [], []
+
+def sample_frame(df, fraction, seed=DEFAULT_SEED, id_column="cad_evnt_id"):
+    """Hash-samples a DataFrame (the Parquet backend's equivalent of `sample_clause`)."""
+    validate_fraction(fraction)
+    if fraction is None or fraction >= 1:
+        return df
+    hashes = pd.util.hash_pandas_object(df[id_column].astype(str) + f":{seed}", index=False)
+    return df[hashes.to_numpy().astype(float) / 2.0 ** 64 < fraction]
+
+def fraction_for_size(total, size):
+    """Sampling fraction that yields about `size` of `total` rows."""
+    return min(1.0, size / total) if total else 1.0
+
+def count_rows(conn, conditions=(), params=()):
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM calls_for_service {where}", list(params))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+def table_distribution(conn, dimension, conditions=(), params=(), use_cache=True):
+    """Full-table row counts per value of `dimension`, computed with a GROUP BY."""
+    if dimension == 'year':
+        if isinstance(conn, sqlite3.Connection):
+            column = "cast(substr(incident_date, 1, 4) as int)"
+        else:
+            column = "CAST(EXTRACT(YEAR FROM incident_date) AS INT)"
+    else:
+        column = dimension
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {column} AS value, COUNT(*) AS n FROM calls_for_service {where} GROUP BY 1"
+    return cache.read_sql(query, conn, list(params), use_cache=use_cache).set_index('value')['n']
+
+def parquet_distribution(engine, dimension, filters=None):
+    """Row counts per value of `dimension` over the Parquet dataset."""
+    if dimension == 'year':
+        dates = engine.scan(columns=['incident_date'], filters=filters)['incident_date']
+        return pd.to_datetime(dates, errors='coerce').dt.year.value_counts()
+    return engine.count([dimension], filters).set_index(dimension)['count']
+
+def frame_distribution(df, dimension):
+    if dimension == 'year':
+        return pd.to_datetime(df['incident_date'], errors='coerce').dt.year.value_counts()
+    return df[dimension].value_counts()
+
+def compare_distributions(full, sample):
+    """Total variation distance between two count Series, plus the largest single gap."""
+    full = full[full.index.notna()].astype(float)
+    full_share = full / full.sum() if full.sum() else full
+    sample_share = sample.astype(float) / sample.sum() if sample.sum() else sample.astype(float)
+    full_share, sample_share = full_share.align(sample_share, fill_value=0.0)
+    gap = (sample_share - full_share).abs()
+    worst = gap.idxmax() if len(gap) else None
+    return {
+        'tvd': 0.5 * gap.sum(),
+        'values': int((full_share > 0).sum()),
+        'missing': int(((full_share > 0) & (sample_share == 0)).sum()),
+        'largest_gap': worst,
+        'full_share': full_share.get(worst, 0.0),
+        'sample_share': sample_share.get(worst, 0.0),
+    }
+
+def sample_report(sample, full_distribution, dimensions=STRATA):
+    """Compares the sample's share of each stratum value with the full table's.
+
+    `full_distribution(dimension)` returns full-table counts per value.
+    Dimensions the sample has no column for are skipped. Logs and returns
+    one row per dimension.
+    """
+    rows = []
+    for dim in dimensions:
+        if (dim == 'year' and 'incident_date' not in sample.columns) or (dim != 'year' and dim not in sample.columns):
+            continue
+        rows.append({'dimension': dim, **compare_distributions(full_distribution(dim), frame_distribution(sample, dim))})
+    for r in rows:
+        logger.info(
+            f"Sample vs full table by {r['dimension']}: TVD {r['tvd']:.4f}, "
+            f"{r['missing']}/{r['values']} values missing, largest gap '{r['largest_gap']}' "
+            f"({r['sample_share']:.2%} vs {r['full_share']:.2%})"
+        )
+    return pd.DataFrame(rows)
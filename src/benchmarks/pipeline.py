@@ -0,0 +1,215 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+
+BENCH_DIR = "data/bench"
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Cases in run order; later cases reuse artifacts written by earlier ones
+CASES = ["clean", "load_sqlite", "load_postgres", "fetch_data", "mine_rules", "train_classifier", "train_regressor"]
+# The pipeline's database; the benchmark must never load into it
+PRODUCTION_DB = "nyc_911_calls"
+
+def bench_database():
+    """Postgres database the benchmark loads into (CRIMECAST_BENCH_DB, default <POSTGRES_DB>_bench).
+
+    The loader truncates calls_for_service, so this refuses any name the
+    pipeline itself uses.
+    """
+    production = {PRODUCTION_DB, os.getenv("POSTGRES_DB", PRODUCTION_DB)}
+    name = os.getenv("CRIMECAST_BENCH_DB", f"{os.getenv('POSTGRES_DB', PRODUCTION_DB)}_bench")
+    if name in production:
+        raise ValueError(f"Refusing to benchmark against the pipeline database '{name}'")
+    if not re.fullmatch(r"\w+", name):
+        raise ValueError(f"Invalid benchmark database name '{name}'")
+    return name
+
+def _recreate_database(name):
+    """Drops and recreates the benchmark database so every load starts empty."""
+    import psycopg2
+    from src.etl.loader import DB_CONFIG
+
+    conn = psycopg2.connect(**dict(DB_CONFIG, dbname="postgres"))
+    conn.autocommit = True  # CREATE/DROP DATABASE cannot run in a transaction
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}"')
+            cursor.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        conn.close()
+
+def _run_case(case, paths, backend):
+    """Runs one benchmark case in the current (fresh) process and returns its metrics.
+
+    Setup work (reading inputs prepared by earlier cases) happens outside the
+    timed block; peak RSS is the high-water mark of this process.
+    """
+    os.chdir(paths["run_dir"])  # keeps models/ and other relative outputs out of the repo
+    os.environ["CRIMECAST_DB_BACKEND"] = "postgres" if case == "load_postgres" else backend
+    os.environ["CRIMECAST_SQLITE_PATH"] = paths["sqlite"]
+    if paths.get("postgres_db"):
+        os.environ["POSTGRES_DB"] = paths["postgres_db"]  # read by the loader's DB_CONFIG at import
+
+    import pandas as pd
+    from src import instrumentation
+    instrumentation.configure(metrics_file="")
+
+    if case == "clean":
+        from src.etl import cleaner
+        shutil.rmtree(paths["processed"], ignore_errors=True)
+        with instrumentation.track(case) as metrics:
+            cleaner.clean_data(paths["raw"], paths["processed"])
+            metrics.add_rows(paths["rows"])
+
+    elif case in ("load_sqlite", "load_postgres"):
+        from src.etl import loader
+        if case == "load_sqlite" and os.path.exists(paths["sqlite"]):
+            os.remove(paths["sqlite"])
+        if case == "load_postgres":
+            _recreate_database(paths["postgres_db"])
+        with instrumentation.track(case) as metrics:
+            if not loader.load_parquet_to_postgres(paths["processed"]):
+                raise RuntimeError("Load did not complete")
+            metrics.add_rows(paths["rows"])
+
+    elif case == "fetch_data":
+        from src.analysis import ml
+        with instrumentation.track(case) as metrics:
+            df = ml.IncidentPredictor().fetch_data(limit=None, use_cache=False)
+            metrics.add_rows(len(df))
+        df.to_pickle(paths["fetched"])
+
+    elif case == "mine_rules":
+        from src.analysis import mining
+        miner = mining.AssociationRuleMiner(min_support=0.001, min_confidence=0.01)
+        basket = miner.load_transactions_df(use_cache=False)
+        if basket is None:
+            raise RuntimeError("No transactions found for mining")
+        with instrumentation.track(case) as metrics:
+            miner.mine_rules(basket)
+            metrics.add_rows(len(basket))
+
+    elif case in ("train_classifier", "train_regressor"):
+        from src.analysis import ml
+        df = pd.read_pickle(paths["fetched"])
+        predictor = ml.IncidentPredictor()
+        train = predictor.train_classification_model if case == "train_classifier" else predictor.train_volume_regression
+        with instrumentation.track(case) as metrics:
+            train(df)
+            metrics.add_rows(len(df))
+
+    else:
+        raise ValueError(f"Unknown case '{case}'")
+
+    return metrics.to_dict()
+
+def run_suite(rows, years, cases, work_dir=BENCH_DIR, seed=42, backend="sqlite"):
+    """Generates (or reuses) a synthetic dataset and times each case in its own process."""
+    from src.etl import synthetic
+
+    data_dir = os.path.abspath(os.path.join(work_dir, f"{rows}-{years[0]}-{years[1]}-{seed}"))
+    run_dir = os.path.join(data_dir, "run")
+    os.makedirs(run_dir, exist_ok=True)
+    paths = {
+        "rows": rows,
+        "raw": os.path.join(data_dir, "raw"),
+        "processed": os.path.join(data_dir, "processed"),
+        "sqlite": os.path.join(data_dir, "bench.db"),
+        "fetched": os.path.join(data_dir, "fetched.pkl"),
+        "run_dir": run_dir,
+        # Only resolved when Postgres is used, so SQLite-only runs need no server
+        "postgres_db": bench_database() if "load_postgres" in cases or backend == "postgres" else None,
+    }
+
+    marker = os.path.join(paths["raw"], ".complete")
+    if not os.path.exists(marker):
+        shutil.rmtree(paths["raw"], ignore_errors=True)
+        synthetic.generate_data(rows, years[0], years[1], paths["raw"], seed)
+        open(marker, "w").close()
+    else:
+        print(f"Reusing synthetic data in {paths['raw']}")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for case in [c for c in CASES if c in cases]:
+        print(f"Running {case}...")
+        try:
+            with ctx.Pool(1) as pool:
+                record = pool.apply(_run_case, (case, paths, backend))
+        except Exception as e:
+            print(f"  {case} failed: {e}")
+            continue
+        results[case] = {k: record[k] for k in ("wall_s", "rows", "rows_per_s", "peak_rss_bytes")}
+    return results
+
+def compare(results, baseline, tolerance=0.10):
+    """Prints each case next to its baseline; returns the cases that regressed."""
+    regressions = []
+    base_cases = baseline.get("cases", {}) if baseline else {}
+    print(f"\n{'case':<18}{'wall (s)':>10}{'rows/s':>14}{'peak RSS (MB)':>15}{'wall vs base':>14}{'RSS vs base':>13}")
+    for case, r in results.items():
+        peak_mb = (r["peak_rss_bytes"] or 0) / 1e6
+        line = f"{case:<18}{r['wall_s']:>10.2f}{(r['rows_per_s'] or 0):>14,.0f}{peak_mb:>15.1f}"
+        base = base_cases.get(case)
+        if base:
+            wall_delta = r["wall_s"] / base["wall_s"] - 1 if base["wall_s"] else 0.0
+            rss_delta = (r["peak_rss_bytes"] / base["peak_rss_bytes"] - 1
+                         if base.get("peak_rss_bytes") and r["peak_rss_bytes"] else 0.0)
+            flag = " !" if wall_delta > tolerance or rss_delta > tolerance else ""
+            if flag:
+                regressions.append(case)
+            line += f"{wall_delta:>+14.1%}{rss_delta:>+13.1%}{flag}"
+        print(line)
+    return regressions
+
+if __name__ == "__main__":
+    from src.etl.synthetic import parse_scale
+
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic data")
+    parser.add_argument("--scale", default="1m", help="Synthetic rows, e.g. 1m, 10m, 100m")
+    parser.add_argument("--start_year", type=int, default=2023)
+    parser.add_argument("--end_year", type=int, default=2023)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=[c for c in CASES if c != "load_postgres"],
+                        help="Cases to run (load_postgres needs a reachable local PostgreSQL)")
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite",
+                        help="Database the fetch/mine cases read from")
+    parser.add_argument("--work_dir", default=BENCH_DIR)
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline results to compare against")
+    parser.add_argument("--save_baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown / memory growth before flagging")
+    args = parser.parse_args()
+
+    rows = parse_scale(args.scale)
+    results = run_suite(rows, (args.start_year, args.end_year), args.cases, args.work_dir, args.seed, args.backend)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("rows") != rows:
+            print(f"Baseline was recorded at {baseline.get('rows')} rows; not comparing.")
+            baseline = None
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    report = {"rows": rows, "seed": args.seed, "backend": args.backend, "ts": time.time(), "cases": results}
+    os.makedirs(args.work_dir, exist_ok=True)
+    out_file = os.path.join(args.work_dir, f"results-{time.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(out_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out_file}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules each pipeline step ends up importing, including the lazily imported
+# third-party dependencies it needs once it actually runs.
+STEP_IMPORTS = {
+    "download": ["src.etl.downloader", "sodapy"],
+    "clean": ["src.etl.cleaner"],
+    "load": ["src.etl.loader", "psycopg2"],
+    "analyze": [
+        "src.analysis.ml", "src.analysis.mining", "src.visualization.generator",
+        "sklearn.linear_model", "sklearn.pipeline", "matplotlib.pyplot", "seaborn",
+    ],
+}
+
+def _run(cmd):
+    """Runs `cmd` in a fresh interpreter and returns its wall time in seconds."""
+    start = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stderr}")
+    return elapsed
+
+def _import_cost(modules):
+    """Measures the import time of `modules` inside a fresh interpreter."""
+    code = (
+        "import time; t = time.perf_counter()\n"
+        + "".join(f"import {m}\n" for m in modules)
+        + "print(time.perf_counter() - t)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+def benchmark(repeat=5):
+    """Returns {name: median seconds} for `--help` and each step's imports."""
+    results = {}
+    samples = [_run([sys.executable, "-m", "src.main", "--help"]) for _ in range(repeat)]
+    results["main --help (wall)"] = statistics.median(samples)
+
+    results["main (import)"] = statistics.median(_import_cost(["src.main"]) for _ in range(repeat))
+
+    for step, modules in STEP_IMPORTS.items():
+        try:
+            samples = [_import_cost(modules) for _ in range(repeat)]
+            results[f"{step} (import)"] = statistics.median(samples)
+        except RuntimeError as e:
+            print(f"Skipping {step}: {e}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure CLI startup and per-step import cost")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    results = benchmark(args.repeat)
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        print(f"{name:<{width}}  {seconds * 1000:8.1f} ms")
@@ -0,0 +1,3 @@
+# Written by the loader after every successful load and removed when a load
+# starts; the database itself has no file mtime for freshness checks to compare.
+LOAD_STAMP = "data/.load_complete"
@@ -1,10 +1,10 @@
 import os
 import argparse
-from sodapy import Socrata
 import pandas as pd
 from datetime import datetime, timedelta
 import time
 from dotenv import load_dotenv
+from src import instrumentation
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +18,8 @@ OUTPUT_DIR = "data/raw"
 def download_data(start_year, end_year, limit=None):
     """Downloads data from NYC Open Data, chunked by year."""
     
+    from sodapy import Socrata
+
     # Ensure raw data directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
@@ -48,43 +50,46 @@ def download_data(start_year, end_year, limit=None):
         where_clause = f"incident_date >= '{start_date}' AND incident_date <= '{end_date}'"
         
         try:
-            # Fetch using generator to handle large volume if supported or loop with offset
-            # For simplicity in this script, we'll fetch in chunks of 50k and append
+            with instrumentation.track(f"download:{year}", year=year) as metrics:
+                # Fetch using generator to handle large volume if supported or loop with offset
+                # For simplicity in this script, we'll fetch in chunks of 50k and append
             
-            chunk_size = 50000
-            offset = 0
-            file_mode = 'w'
-            header = True
-            total_records = 0
+                chunk_size = 50000
+                offset = 0
+                file_mode = 'w'
+                header = True
+                total_records = 0
             
-            while True:
-                results = client.get(
-                    DATASET_ID, 
-                    where=where_clause,
-                    limit=chunk_size,
-                    offset=offset,
-                    order="incident_date"
-                )
+                while True:
+                    results = client.get(
+                        DATASET_ID, 
+                        where=where_clause,
+                        limit=chunk_size,
+                        offset=offset,
+                        order="incident_date"
+                    )
                 
-                if not results:
-                    break
+                    if not results:
+                        break
                     
-                df = pd.DataFrame.from_records(results)
+                    df = pd.DataFrame.from_records(results)
                 
-                # Append to CSV
-                df.to_csv(output_file, mode=file_mode, header=header, index=False)
+                    # Append to CSV
+                    df.to_csv(output_file, mode=file_mode, header=header, index=False)
                 
-                total_records += len(df)
-                offset += chunk_size
-                file_mode = 'a'
-                header = False
+                    total_records += len(df)
+                    metrics.add_rows(len(df))
+                    offset += chunk_size
+                    file_mode = 'a'
+                    header = False
                 
-                print(f"  Downloaded {total_records} rows for {year}...", end='\r')
+                    print(f"  Downloaded {total_records} rows for {year}...", end='\r')
                 
-                if limit and total_records >= limit:
-                    break
+                    if limit and total_records >= limit:
+                        break
             
-            print(f"\nCompleted {year}: {total_records} rows saved to {output_file}")
+                metrics.add_written(output_file)
+                print(f"\nCompleted {year}: {total_records} rows saved to {output_file}")
             
         except Exception as e:
             print(f"Error downloading {year}: {e}")
@@ -1,9 +1,13 @@
 import os
-import psycopg2
 import pandas as pd
 import glob
 from tqdm import tqdm
 from dotenv import load_dotenv
+from src import instrumentation
+from src.spatial.grid import assign_grid_cell
+from src.analysis.latency import LatencySketches
+from src.analysis.cache import QueryCache
+from src.etl import LOAD_STAMP
 
 load_dotenv()
 
@@ -17,24 +21,148 @@ DB_CONFIG = {
 
 import sqlite3
 
+SQLITE_PATH = "crimecast.db"
+
 def get_connection():
+    """Connects to PostgreSQL, falling back to SQLite.
+
+    CRIMECAST_DB_BACKEND ('postgres' or 'sqlite') forces a backend instead of
+    falling back; CRIMECAST_SQLITE_PATH overrides the SQLite database file.
+    Both are read per call so benchmarks can switch backends in-process.
+    """
+    backend = os.getenv("CRIMECAST_DB_BACKEND", "auto").lower()
+    sqlite_path = os.getenv("CRIMECAST_SQLITE_PATH", SQLITE_PATH)
+    if backend == "sqlite":
+        return sqlite3.connect(sqlite_path)
+
+    # Imported lazily so SQLite-only runs never pay for the driver import
     try:
+        import psycopg2
         conn = psycopg2.connect(**DB_CONFIG)
         return conn
     except Exception:
+        if backend == "postgres":
+            raise
         print("PostgreSQL connection failed. Falling back to SQLite.")
-        return sqlite3.connect("crimecast.db")
+        return sqlite3.connect(sqlite_path)
+
+def date_range_clause(conn, start_date=None, end_date=None, column="incident_date"):
+    """Builds a parameterized `start_date <= column < end_date` filter.
+
+    Returns (conditions, params) using the connection's placeholder style.
+    Bounds are passed as plain literals so Postgres coerces them to the
+    column type at plan time and can prune partitions outside the range.
+    SQLite compares the stored 'YYYY-MM-DD' text, so its bounds are dates.
+    """
+    is_sqlite = isinstance(conn, sqlite3.Connection)
+    placeholder = "?" if is_sqlite else "%s"
+    fmt = "%Y-%m-%d" if is_sqlite else "%Y-%m-%d %H:%M:%S"
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append(f"{column} >= {placeholder}")
+        params.append(pd.Timestamp(start_date).strftime(fmt))
+    if end_date is not None:
+        conditions.append(f"{column} < {placeholder}")
+        params.append(pd.Timestamp(end_date).strftime(fmt))
+    return conditions, params
+
+def _is_partitioned(cursor):
+    cursor.execute("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'calls_for_service'
+    """)
+    return cursor.fetchone() is not None
 
-def load_parquet_to_postgres(processed_dir):
-    """Loads Parquet files from processed directory into DB."""
+def _default_partition(cursor):
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'calls_for_service' AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'
+    """)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def ensure_year_partitions(conn, years):
+    """Creates missing yearly partitions (calls_YYYY) of a partitioned calls table.
+
+    Rows of those years already sitting in the DEFAULT partition are moved
+    into the new partition before it is attached, as Postgres requires.
+    Does nothing if the table is not partitioned.
+    """
+    cursor = conn.cursor()
+    if not _is_partitioned(cursor):
+        return []
+
+    created = []
+    default = _default_partition(cursor)
+    for year in sorted(set(int(y) for y in years)):
+        name = f"calls_{year}"
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0] is not None:
+            continue
+        start, end = f"{year}-01-01", f"{year + 1}-01-01"
+        try:
+            cursor.execute(f"CREATE TABLE {name} (LIKE calls_for_service INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            if default:
+                cursor.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM {default} WHERE incident_date >= %s AND incident_date < %s RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved
+                """, (start, end))
+            cursor.execute(f"ALTER TABLE calls_for_service ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+            conn.commit()
+            created.append(name)
+            print(f"Created partition {name}.")
+        except Exception as e:
+            print(f"Error creating partition {name}: {e}")
+            conn.rollback()
+    return created
+
+def use_brin_index(conn):
+    """Replaces the B-tree index on incident_date with a much smaller BRIN index.
+
+    BRIN stores min/max per block range, so it suits data loaded in date
+    order (as the downloader and cleaner produce) and time-range scans.
+    """
+    cursor = conn.cursor()
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_incident_date_brin ON calls_for_service USING BRIN (incident_date)")
+    cursor.execute("DROP INDEX IF EXISTS idx_incident_date")
+    cursor.execute("ANALYZE calls_for_service")
+    conn.commit()
+    print("Using BRIN index on incident_date.")
+
+def _ensure_sqlite_column(conn, column, sql_type):
+    """Adds `column` to an existing SQLite calls table created before it existed."""
+    existing = [row[1] for row in conn.execute("PRAGMA table_info(calls_for_service)")]
+    if existing and column not in existing:
+        conn.execute(f"ALTER TABLE calls_for_service ADD COLUMN {column} {sql_type}")
+        conn.commit()
+
+def load_parquet_to_postgres(processed_dir, use_brin=False):
+    """Loads Parquet files from processed directory into DB.
+
+    On a partitioned Postgres table, missing yearly partitions are created
+    before each file is copied. `use_brin` switches the incident_date index
+    to BRIN after loading. Response-latency sketches are updated per file and
+    saved alongside, replacing those of the previous load. The query-result
+    cache is invalidated afterwards, even if the load failed part way, and
+    LOAD_STAMP is rewritten only once every file was loaded. Returns True if
+    every file was loaded.
+    """
     
     files = glob.glob(os.path.join(processed_dir, "*.parquet"))
     if not files:
         print(f"No parquet files found in {processed_dir}")
-        return
+        return False
 
     conn = get_connection()
     is_sqlite = isinstance(conn, sqlite3.Connection)
+    # Analysis outputs are stale from here until the load completes
+    if os.path.exists(LOAD_STAMP):
+        os.remove(LOAD_STAMP)
     
     if is_sqlite:
         print("Using SQLite for data loading...")
@@ -63,8 +191,10 @@ def load_parquet_to_postgres(processed_dir):
         location_type_code TEXT,
         city TEXT,
         latitude FLOAT,
-        longitude FLOAT
+        longitude FLOAT,
+        grid_cell INT
     );
+    ALTER TABLE calls_for_service ADD COLUMN IF NOT EXISTS grid_cell INT;
     TRUNCATE TABLE calls_for_service;
     """
     if not is_sqlite:
@@ -75,53 +205,92 @@ def load_parquet_to_postgres(processed_dir):
         except Exception as e:
             print(f"Error creating table: {e}")
             conn.rollback()
+    else:
+        _ensure_sqlite_column(conn, "grid_cell", "INTEGER")
+        # Like the Postgres TRUNCATE: every load replaces the table's contents
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'calls_for_service'").fetchone():
+            conn.execute("DELETE FROM calls_for_service")
+            conn.commit()
+            print("Table 'calls_for_service' cleared.")
+
+    # The table is reloaded from scratch on both backends, so the sketches are too
+    sketches = LatencySketches()
 
     try:
         for file in tqdm(files, desc="Loading Files"):
-            df = pd.read_parquet(file)
+            with instrumentation.track(f"load:{os.path.basename(file)}") as metrics:
+                df = pd.read_parquet(file)
+                metrics.add_read(file)
+                metrics.add_rows(len(df))
+                sketches.update(df)
             
-            # Column mapping/filtering
-            columns = [
-                "cad_evnt_id", "created_date", "incident_date", "incident_time",
-                "ny_cli", "arrival_time", "closing_time", "vol_id",
-                "precinct_id", "sector_id", "borough", "patrol_boro",
-                "complaint_type", "descriptor", "location_type_code",
-                "city", "latitude", "longitude"
-            ]
+                # Column mapping/filtering
+                columns = [
+                    "cad_evnt_id", "created_date", "incident_date", "incident_time",
+                    "ny_cli", "arrival_time", "closing_time", "vol_id",
+                    "precinct_id", "sector_id", "borough", "patrol_boro",
+                    "complaint_type", "descriptor", "location_type_code",
+                    "city", "latitude", "longitude", "grid_cell"
+                ]
+
+                # Files cleaned before grid cells existed get them here
+                if 'grid_cell' not in df.columns and {'latitude', 'longitude'} <= set(df.columns):
+                    df['grid_cell'] = assign_grid_cell(df['latitude'].to_numpy(), df['longitude'].to_numpy())
             
-            # Align columns
-            for col in columns:
-                if col not in df.columns:
-                    df[col] = None
-            df = df[columns]
-
-            if is_sqlite:
-                # SQLite loading via Pandas
-                # Convert timestamps to string/ISO for SQLite
-                for col in df.select_dtypes(include=['datetime64[ns]']):
-                    df[col] = df[col].astype(str)
+                # Align columns
+                for col in columns:
+                    if col not in df.columns:
+                        df[col] = None
+                df = df[columns]
+
+                if is_sqlite:
+                    # SQLite loading via Pandas
+                    # Convert timestamps to string/ISO for SQLite
+                    for col in df.select_dtypes(include=['datetime64[ns]']):
+                        df[col] = df[col].astype(str)
                     
-                df.to_sql("calls_for_service", conn, if_exists='append', index=False)
-            else:
-                # Postgres COPY
-                from io import StringIO
-                buffer = StringIO()
-                df.to_csv(buffer, index=False, header=False, sep='\t', na_rep='\\N')
-                buffer.seek(0)
-                cursor.copy_from(buffer, 'calls_for_service', sep='\t', null='\\N', columns=columns)
-                conn.commit()
+                    df.to_sql("calls_for_service", conn, if_exists='append', index=False)
+                else:
+                    # Route new years to their own partition instead of calls_default
+                    years = pd.to_datetime(df['incident_date'], errors='coerce').dt.year.dropna().unique()
+                    ensure_year_partitions(conn, years)
+
+                    # Postgres COPY
+                    from io import StringIO
+                    buffer = StringIO()
+                    df.to_csv(buffer, index=False, header=False, sep='\t', na_rep='\\N')
+                    metrics.bytes_written += buffer.tell()
+                    buffer.seek(0)
+                    cursor.copy_from(buffer, 'calls_for_service', sep='\t', null='\\N', columns=columns)
+                    conn.commit()
                 
+        sketches.save()
+
+        if is_sqlite:
+            # Lets date-range queries use an index instead of a full scan
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_incident_date ON calls_for_service (incident_date)")
+            conn.commit()
+        elif use_brin:
+            use_brin_index(conn)
+
+        os.makedirs(os.path.dirname(LOAD_STAMP), exist_ok=True)
+        with open(LOAD_STAMP, 'w'):
+            pass
         print("Data load complete.")
+        return True
         
     except Exception as e:
         print(f"Error loading data: {e}")
+        return False
     finally:
         conn.close()
+        QueryCache().invalidate()
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", default="data/processed", help="Input directory containing parquet files")
+    parser.add_argument("--brin", action="store_true", help="Use a BRIN index on incident_date (Postgres)")
     args = parser.parse_args()
     
-    load_parquet_to_postgres(args.input)
+    load_parquet_to_postgres(args.input, use_brin=args.brin)
@@ -0,0 +1,178 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+OUTPUT_DIR = "data/raw"
+CHUNK_SIZE = 1_000_000
+
+# Socrata timestamp format, as written by the downloader
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.000"
+
+# Borough -> (share of calls, centre (lat, lon), spread (lat, lon), precincts, patrol boroughs)
+BOROUGHS = {
+    "BROOKLYN": (0.30, (40.6500, -73.9496), (0.045, 0.050), list(range(60, 95)),
+                 ["PATROL BORO BKLYN NORTH", "PATROL BORO BKLYN SOUTH"]),
+    "MANHATTAN": (0.22, (40.7831, -73.9712), (0.040, 0.020), [1, 5, 6, 7, 9, 10, 13, 14, 17, 18, 19, 20, 22,
+                                                              23, 24, 25, 26, 28, 30, 32, 33, 34],
+                  ["PATROL BORO MAN SOUTH", "PATROL BORO MAN NORTH"]),
+    "BRONX": (0.22, (40.8448, -73.8648), (0.030, 0.035), list(range(40, 53)), ["PATROL BORO BRONX"]),
+    "QUEENS": (0.21, (40.7282, -73.7949), (0.050, 0.070), list(range(100, 116)),
+               ["PATROL BORO QUEENS NORTH", "PATROL BORO QUEENS SOUTH"]),
+    "STATEN ISLAND": (0.05, (40.5795, -74.1502), (0.035, 0.040), [120, 121, 122, 123],
+                      ["PATROL BORO STATEN ISLAND"]),
+}
+
+# Call types in rough order of frequency; weights follow a Zipf-like tail
+COMPLAINT_TYPES = [
+    "DISPUTE", "INVESTIGATE/POSSIBLE CRIME", "ALARMS", "VEHICLE ACCIDENT", "ASSAULT (IN PROGRESS)",
+    "LARCENY", "HARASSMENT", "NOISE", "DISORDERLY", "ROBBERY", "BURGLARY", "FELONY ASSAULT",
+    "GRAND LARCENY", "SUSPICIOUS PERSON", "DOMESTIC INCIDENT", "EDP", "CRIMINAL MISCHIEF",
+    "GRAND LARCENY OF MOTOR VEHICLE", "SHOTS FIRED", "MISSING PERSON", "TRESPASS", "WEAPONS",
+    "DRUGS", "PERSON WITH KNIFE", "PERSON WITH GUN", "VEHICLE STOLEN", "INJURED PERSON",
+    "CHILD ABUSE", "RAPE", "MURDER",
+]
+RADIO_CODES = ["10-10", "10-34", "10-52", "10-53", "10-31", "10-30", "10-20", "10-11"]
+
+# Relative call volume by hour of day: quiet before dawn, peaking in the evening
+HOURLY_PROFILE = np.array([
+    4.0, 3.2, 2.6, 2.1, 1.7, 1.6, 2.0, 2.8, 3.6, 4.1, 4.4, 4.6,
+    4.8, 4.9, 5.1, 5.4, 5.7, 5.9, 6.0, 5.9, 5.6, 5.2, 4.8, 4.4,
+])
+# Relative volume by day of week (Monday=0)
+WEEKLY_PROFILE = np.array([0.97, 0.96, 0.97, 0.99, 1.05, 1.08, 1.00])
+HOTSPOTS_PER_BOROUGH = 12
+HOTSPOT_SHARE = 0.6  # Share of calls drawn from hotspot clusters rather than the borough spread
+
+def parse_scale(scale):
+    """Parses row counts such as '1m', '250k', '100M' or '5000'."""
+    text = str(scale).strip().lower().replace("_", "")
+    multiplier = 1
+    if text and text[-1] in "kmb":
+        multiplier = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}[text[-1]]
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+def _zipf_weights(n, s=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+def _hotspots(seed):
+    """Fixed hotspot centres per borough, derived only from the seed."""
+    rng = np.random.default_rng([seed, 0])
+    centres = {}
+    for name, (_, (lat, lon), (lat_sd, lon_sd), _, _) in BOROUGHS.items():
+        centres[name] = np.column_stack([
+            rng.normal(lat, lat_sd * 0.6, HOTSPOTS_PER_BOROUGH),
+            rng.normal(lon, lon_sd * 0.6, HOTSPOTS_PER_BOROUGH),
+        ])
+    return centres
+
+def generate_chunk(n, year, rng, hotspots, id_offset=0):
+    """Generates `n` synthetic raw rows for `year` in the downloader's schema."""
+    names = list(BOROUGHS)
+    shares = np.array([BOROUGHS[b][0] for b in names])
+    boro_idx = rng.choice(len(names), size=n, p=shares / shares.sum())
+
+    # Day of year weighted by weekday and a mild summer peak; hour by the diurnal profile
+    days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+    day_weights = WEEKLY_PROFILE[days.dayofweek.to_numpy()] * (1.0 + 0.15 * np.sin((days.dayofyear.to_numpy() - 100) / 365 * 2 * np.pi))
+    day_idx = rng.choice(len(days), size=n, p=day_weights / day_weights.sum())
+    hours = rng.choice(24, size=n, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    seconds = hours * 3600 + rng.integers(0, 3600, size=n)
+
+    incident_date = days.values[day_idx]
+    incident_ts = incident_date + seconds.astype("timedelta64[s]")
+    created_ts = incident_ts + rng.integers(0, 120, size=n).astype("timedelta64[s]")
+
+    # Response times: lognormal travel time, a share of calls never get an arrival
+    arrival_s = rng.lognormal(mean=np.log(480), sigma=0.8, size=n)
+    on_scene_s = rng.lognormal(mean=np.log(2400), sigma=0.9, size=n)
+    arrival_ts = created_ts + arrival_s.astype("timedelta64[s]")
+    closing_ts = arrival_ts + on_scene_s.astype("timedelta64[s]")
+    no_arrival = rng.random(n) < 0.1
+    arrival_ts = np.where(no_arrival, np.datetime64("NaT"), arrival_ts)
+
+    lat = np.empty(n)
+    lon = np.empty(n)
+    precinct = np.empty(n, dtype=np.int64)
+    patrol = np.empty(n, dtype=object)
+    for i, name in enumerate(names):
+        mask = boro_idx == i
+        count = int(mask.sum())
+        if not count:
+            continue
+        _, (c_lat, c_lon), (lat_sd, lon_sd), precincts, patrols = BOROUGHS[name]
+        in_hotspot = rng.random(count) < HOTSPOT_SHARE
+        spot = hotspots[name][rng.integers(0, HOTSPOTS_PER_BOROUGH, size=count)]
+        lat[mask] = np.where(in_hotspot, rng.normal(spot[:, 0], 0.004), rng.normal(c_lat, lat_sd, count))
+        lon[mask] = np.where(in_hotspot, rng.normal(spot[:, 1], 0.005), rng.normal(c_lon, lon_sd, count))
+        precinct[mask] = np.asarray(precincts)[rng.choice(len(precincts), size=count, p=_zipf_weights(len(precincts), 0.5))]
+        patrol[mask] = np.asarray(patrols, dtype=object)[rng.integers(0, len(patrols), size=count)]
+
+    types = np.asarray(COMPLAINT_TYPES, dtype=object)[rng.choice(len(COMPLAINT_TYPES), size=n, p=_zipf_weights(len(COMPLAINT_TYPES)))]
+    # Roughly 1% of calls carry no usable location
+    missing_geo = rng.random(n) < 0.01
+    lat[missing_geo] = np.nan
+    lon[missing_geo] = np.nan
+
+    return pd.DataFrame({
+        "cad_evnt_id": (np.arange(n, dtype=np.int64) + id_offset).astype(str),
+        "create_date": pd.to_datetime(created_ts),
+        "incident_date": pd.to_datetime(incident_date),
+        "incident_time": pd.to_datetime(incident_ts).strftime("%H:%M:%S"),
+        "nypd_pct_cd": precinct,
+        "boro_nm": np.asarray(names, dtype=object)[boro_idx],
+        "patrl_boro_nm": patrol,
+        "typ_desc": types,
+        "radio_code": np.asarray(RADIO_CODES, dtype=object)[rng.integers(0, len(RADIO_CODES), size=n)],
+        "add_ts": pd.to_datetime(created_ts),
+        "arrivd_ts": pd.to_datetime(arrival_ts),
+        "closng_ts": pd.to_datetime(closing_ts),
+        "latitude": np.round(lat, 6),
+        "longitude": np.round(lon, 6),
+    })
+
+def generate_data(rows, start_year, end_year, output_dir=OUTPUT_DIR, seed=42, chunk_size=CHUNK_SIZE):
+    """Writes `rows` synthetic calls as one `nypd_calls_{year}.csv` per year.
+
+    Output is deterministic for a given (rows, years, seed, chunk_size) and
+    uses the same columns and timestamp format as the downloader. Rows are
+    generated and appended in chunks, so memory stays bounded at any scale.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    years = list(range(start_year, end_year + 1))
+    hotspots = _hotspots(seed)
+    per_year = [rows // len(years) + (1 if i < rows % len(years) else 0) for i in range(len(years))]
+
+    print(f"Generating {rows} synthetic rows for years {start_year}-{end_year}...")
+    id_offset = 0
+    paths = []
+    for year, year_rows in zip(years, per_year):
+        output_file = os.path.join(output_dir, f"nypd_calls_{year}.csv")
+        written = 0
+        chunk_idx = 0
+        while written < year_rows:
+            n = min(chunk_size, year_rows - written)
+            rng = np.random.default_rng([seed, year, chunk_idx])
+            df = generate_chunk(n, year, rng, hotspots, id_offset=id_offset)
+            df.to_csv(output_file, mode='w' if chunk_idx == 0 else 'a', header=chunk_idx == 0,
+                      index=False, date_format=TIMESTAMP_FORMAT)
+            written += n
+            id_offset += n
+            chunk_idx += 1
+            print(f"  Generated {written} rows for {year}...", end='\r')
+        print(f"\nCompleted {year}: {written} rows saved to {output_file}")
+        paths.append(output_file)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic NYPD 911 call data")
+    parser.add_argument("--rows", default="1m", help="Total rows, e.g. 1m, 10m, 100m")
+    parser.add_argument("--start", type=int, default=2023, help="Start Year")
+    parser.add_argument("--end", type=int, default=2023, help="End Year")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Output directory")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    generate_data(parse_scale(args.rows), args.start, args.end, args.output, args.seed)
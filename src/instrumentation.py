@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = "data/output/metrics.jsonl"
+PROFILE_DIR = "data/output/profiles"
+
+_config = {
+    "metrics_file": METRICS_FILE,
+    "profile": False,
+    "profile_dir": PROFILE_DIR,
+    "run_id": time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}",
+}
+_local = threading.local()
+_write_lock = threading.Lock()
+
+def configure(metrics_file=None, profile=None, profile_dir=None):
+    """Sets where metrics are written and whether stages are profiled.
+
+    Pass `metrics_file=""` to disable writing metrics.
+    """
+    if metrics_file is not None:
+        _config["metrics_file"] = metrics_file
+    if profile is not None:
+        _config["profile"] = profile
+    if profile_dir is not None:
+        _config["profile_dir"] = profile_dir
+
+# How often the current RSS is sampled while tracked blocks run
+RSS_SAMPLE_INTERVAL_S = 0.02
+
+def _maxrss_bytes(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def peak_rss_bytes():
+    """Returns the process's lifetime peak resident set size, or None if unknown."""
+    return _maxrss_bytes(resource.RUSAGE_SELF) if resource else None
+
+def children_peak_rss_bytes():
+    """Returns the largest peak RSS of any finished child process (e.g. pool workers)."""
+    return _maxrss_bytes(resource.RUSAGE_CHILDREN) if resource else None
+
+def current_rss_bytes():
+    """Returns the process's current resident set size, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+class _RssSampler:
+    """Background thread sampling the current RSS into every active tracked block."""
+
+    def __init__(self):
+        self._active = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def register(self, metrics):
+        with self._cond:
+            self._active.add(metrics)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        self.sample([metrics])
+
+    def unregister(self, metrics):
+        self.sample([metrics])
+        with self._cond:
+            self._active.discard(metrics)
+
+    def sample(self, blocks):
+        rss = current_rss_bytes()
+        if rss is None:
+            return
+        with self._cond:
+            stages = [m for m in self._active if m.parent is None]
+        for metrics in blocks:
+            metrics.observe_rss(rss, stages)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                active = list(self._active)
+            self.sample(active)
+            time.sleep(RSS_SAMPLE_INTERVAL_S)
+
+_sampler = _RssSampler()
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class StageMetrics:
+    """Counters a tracked stage fills in while it runs."""
+
+    def __init__(self, name, parent=None, **extra):
+        self.name = name
+        self.parent = parent
+        self.rows = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.extra = dict(extra)
+        self.status = "ok"
+        self.wall_s = None
+        self.thread = threading.get_ident()
+        self.rss_start = None
+        self.peak_rss = None
+        self.children_peak_rss = None
+        self.concurrent = set()
+
+    def observe_rss(self, rss, stages=()):
+        """Records an RSS sample, and which top-level stages of other threads were running."""
+        if self.rss_start is None:
+            self.rss_start = rss
+        self.peak_rss = rss if self.peak_rss is None else max(self.peak_rss, rss)
+        self.concurrent.update(m.name for m in stages if m.thread != self.thread)
+
+    def add_rows(self, n):
+        self.rows = (self.rows or 0) + int(n)
+
+    def add_read(self, path):
+        """Counts the size of a file this stage read."""
+        self.bytes_read += file_size(path)
+
+    def add_written(self, path):
+        """Counts the size of a file this stage wrote."""
+        self.bytes_written += file_size(path)
+
+    def to_dict(self):
+        record = {
+            "run_id": _config["run_id"],
+            "ts": time.time(),
+            "stage": self.name,
+            "parent": self.parent,
+            "status": self.status,
+            "wall_s": round(self.wall_s, 6) if self.wall_s is not None else None,
+            "rows": self.rows,
+            "rows_per_s": round(self.rows / self.wall_s, 1) if self.rows and self.wall_s else None,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "peak_rss_bytes": self.peak_rss,
+            "rss_growth_bytes": self.peak_rss - self.rss_start if self.peak_rss is not None else None,
+            "children_peak_rss_bytes": self.children_peak_rss,
+            "process_peak_rss_bytes": peak_rss_bytes(),
+            "concurrent_stages": sorted(self.concurrent) or None,
+        }
+        record.update(self.extra)
+        return record
+
+def _emit(record):
+    path = _config["metrics_file"]
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+def _profile_path(name, suffix):
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    directory = os.path.join(_config["profile_dir"], _config["run_id"])
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{safe}{suffix}")
+
+@contextmanager
+def track(name, **extra):
+    """Records wall time, rows, bytes and peak RSS of the enclosed block.
+
+    Blocks can be nested (e.g. a per-file sub-step inside the `clean` stage);
+    the enclosing block is recorded as `parent`. Peak RSS is the highest
+    current RSS sampled while the block ran. RSS is per process, so stages
+    running concurrently in other threads (listed in `concurrent_stages`)
+    are included; child processes that finished during the block (e.g. plot
+    workers) are reported separately as `children_peak_rss_bytes`. One JSON line per block is
+    appended to the metrics file. With profiling enabled, outermost blocks are
+    also run under cProfile and tracemalloc and their dumps written to the
+    profile directory.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    metrics = StageMetrics(name, parent=stack[-1] if stack else None, **extra)
+
+    profiler = None
+    if _config["profile"] and not stack:
+        profiler = cProfile.Profile()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler.enable()
+
+    stack.append(name)
+    children_before = children_peak_rss_bytes()
+    _sampler.register(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    except BaseException:
+        metrics.status = "error"
+        raise
+    finally:
+        metrics.wall_s = time.perf_counter() - start
+        stack.pop()
+        _sampler.unregister(metrics)
+        children_after = children_peak_rss_bytes()
+        # RUSAGE_CHILDREN is a high-water mark: only a new high belongs to this block
+        if children_after is not None and children_after > (children_before or 0):
+            metrics.children_peak_rss = children_after
+
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(_profile_path(name, ".prof"))
+            _, traced_peak = tracemalloc.get_traced_memory()
+            metrics.extra["traced_peak_bytes"] = traced_peak
+            top = tracemalloc.take_snapshot().statistics("lineno")[:25]
+            with open(_profile_path(name, ".tracemalloc.txt"), "w") as f:
+                f.write(f"Traced peak: {traced_peak / 1e6:.1f} MB\n")
+                f.writelines(f"{stat}\n" for stat in top)
+
+        record = metrics.to_dict()
+        logger.debug(f"Metrics: {record}")
+        try:
+            _emit(record)
+        except OSError as e:
+            logger.warning(f"Could not write metrics for '{name}': {e}")
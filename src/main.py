@@ -1,84 +1,195 @@
 import argparse
+import glob
 import logging
-from src.etl import downloader, cleaner, loader
-from src.analysis import ml, mining
-from src.visualization import generator
-import pandas as pd
 import os
 
+from src import instrumentation
+from src.etl import LOAD_STAMP
+from src.orchestrator import StageGraph
+
+# Subsystems are imported inside their stage so that e.g. `--step download`
+# does not pay for sklearn/matplotlib/psycopg2 imports it never uses.
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_pipeline(args):
-    """Orchestrates the data pipeline."""
-    
+RAW_DIR = "data/raw"
+PROCESSED_DIR = "data/processed"
+RULES_FILE = "data/output/association_rules.csv"
+
+# --step value -> target stages
+STEP_TARGETS = {
+    'download': ['download'],
+    'clean': ['clean'],
+    'load': ['load'],
+    'analyze': ['classifier', 'regressor', 'plots', 'mining'],
+    'all': ['download', 'clean', 'load', 'classifier', 'regressor', 'plots', 'mining'],
+}
+
+def build_graph(args):
+    """Declares the pipeline stages and the files each one reads and writes."""
+    graph = StageGraph()
+
+    def raw_files():
+        return sorted(glob.glob(os.path.join(RAW_DIR, "*.csv")))
+
+    def processed_files():
+        return sorted(glob.glob(os.path.join(PROCESSED_DIR, "*.parquet")))
+
     # 1. Download
-    if args.step in ['all', 'download']:
-        logger.info("Starting Download Step...")
+    def download(ctx):
+        from src.etl import downloader
         downloader.download_data(args.start_year, args.end_year, args.limit)
-    
+
+    graph.add('download', download, outputs=lambda: [
+        os.path.join(RAW_DIR, f"nypd_calls_{year}.csv") for year in range(args.start_year, args.end_year + 1)
+    ])
+
     # 2. Clean
-    if args.step in ['all', 'clean']:
-        logger.info("Starting Clean Step...")
-        raw_path = "data/raw"
-        processed_path = "data/processed"
-        cleaner.clean_data(raw_path, processed_path)
-        
+    def clean(ctx):
+        from src.etl import cleaner
+        cleaner.clean_data(RAW_DIR, PROCESSED_DIR)
+
+    graph.add('clean', clean, deps=['download'], inputs=raw_files, outputs=lambda: [
+        os.path.join(PROCESSED_DIR, os.path.basename(f).replace('.csv', '.parquet')) for f in raw_files()
+    ])
+
     # 3. Load
-    if args.step in ['all', 'load']:
-        logger.info("Starting Load Step...")
-        loader.load_parquet_to_postgres("data/processed")
-        
-    # 4. Analyze & ML & Visualize
-    if args.step in ['all', 'analyze']:
-        logger.info("Starting Analysis & ML Step...")
-        
-        # Initialize Predictor
-        predictor = ml.IncidentPredictor()
-        
-        # Train generic Classification model (High Priority prediction)
+    def load(ctx):
+        from src.etl import loader
+        if not loader.load_parquet_to_postgres(PROCESSED_DIR, use_brin=args.brin):
+            raise RuntimeError("Load did not complete")
+
+    graph.add('load', load, deps=['clean'], inputs=processed_files, outputs=[LOAD_STAMP])
+
+    # 4. Analyze & ML & Visualize: independent once the data is fetched.
+    # With --backend parquet they read data/processed directly and skip the DB.
+    if args.backend == 'parquet':
+        source_stage, source_inputs = 'clean', processed_files
+    else:
+        source_stage, source_inputs = 'load', [LOAD_STAMP]
+
+    # Arguments that change what the analysis stages read; a change reruns them
+    mining_params = {
+        'backend': args.backend, 'start_date': args.start_date, 'end_date': args.end_date,
+        'sample_fraction': args.sample_fraction, 'sample_size': args.sample_size, 'seed': args.seed,
+    }
+    fetch_params = dict(mining_params, limit=args.limit)
+
+    def fetch(ctx):
+        from src.analysis import ml
         logger.info("Fetching training data (Full Dataset)...")
         # Use args.limit if provided, else None for full DB
-        limit = args.limit if args.limit else None 
-        df = predictor.fetch_data(limit=limit)
-        
-        if not df.empty:
-            logger.info("Training Classifier...")
-            predictor.train_classification_model(df)
-            
-            logger.info("Training Regressor...")
-            predictor.train_volume_regression(df)
-            
-            logger.info("Generating Visualizations...")
-            generator.plot_heatmap(df)
-            generator.plot_incident_trends(df, "2024 Data")
-            generator.plot_crime_by_borough(df)
-            generator.plot_top_crime_types(df)
-            generator.plot_hourly_distribution(df)
-            generator.plot_spatial_scatter(df)
-            generator.plot_priority_distribution(df)
-            
-            # Mining
-            logger.info("Running Association Rule Mining (Optimized)...")
-            miner = mining.AssociationRuleMiner(min_support=0.001, min_confidence=0.01)
-            basket = miner.load_transactions_df()
-            if basket is not None:
-                rules_df = miner.mine_rules(basket)
-                logger.info(f"Discovered {len(rules_df)} rules.")
-                if not rules_df.empty:
-                    print(rules_df.head())
-                    generator.plot_association_rules(rules_df)
-            else:
-                logger.warning("No transactions found for mining.")
+        df = ml.IncidentPredictor().fetch_data(
+            limit=args.limit or None, backend=args.backend, start_date=args.start_date, end_date=args.end_date,
+            use_cache=not args.no_cache,
+            sample_fraction=args.sample_fraction, sample_size=args.sample_size, seed=args.seed,
+        )
+        if df.empty:
+            raise RuntimeError("No data found in DB to analyze. Please ensure 'load' step ran successfully.")
+        return df
+
+    graph.add('fetch', fetch, deps=[source_stage])
+
+    def classifier(ctx):
+        from src.analysis import ml
+        ml.IncidentPredictor().train_classification_model(ctx['fetch'])
+
+    graph.add('classifier', classifier, deps=['fetch'], inputs=source_inputs,
+              outputs=["models/crime_classifier.joblib"], params=fetch_params)
+
+    def regressor(ctx):
+        from src.analysis import ml
+        ml.IncidentPredictor().train_volume_regression(ctx['fetch'])
+
+    graph.add('regressor', regressor, deps=['fetch'], inputs=source_inputs,
+              outputs=["models/volume_regressor.joblib"], params=fetch_params)
+
+    def plots(ctx):
+        from src.visualization import generator
+        generator.render_all(ctx['fetch'], "2024 Data", jobs=args.plot_jobs)
+
+    def plot_outputs():
+        from src.visualization import generator
+        return generator.plot_paths()
+
+    graph.add('plots', plots, deps=['fetch'], inputs=source_inputs, outputs=plot_outputs, params=fetch_params)
+
+    def mine(ctx):
+        from src.analysis import mining
+        from src.visualization import generator
+        logger.info("Running Association Rule Mining (Optimized)...")
+        miner = mining.AssociationRuleMiner(min_support=0.001, min_confidence=0.01)
+        basket = miner.load_transactions_df(
+            backend=args.backend, start_date=args.start_date, end_date=args.end_date,
+            use_cache=not args.no_cache,
+            sample_fraction=args.sample_fraction, sample_size=args.sample_size, seed=args.seed,
+        )
+        if basket is None:
+            logger.warning("No transactions found for mining.")
+            rules_df = miner.rules_df
         else:
-            logger.warning("No data found in DB to analyze. Please ensure 'load' step ran successfully.")
+            rules_df = miner.mine_rules(basket)
+            logger.info(f"Discovered {len(rules_df)} rules.")
+        if not rules_df.empty:
+            print(rules_df.head())
+            generator.plot_association_rules(rules_df)
+        # Written even without rules, so the stage's output always exists once it has run
+        os.makedirs(os.path.dirname(RULES_FILE), exist_ok=True)
+        rules_df.to_csv(RULES_FILE, index=False)
 
-if __name__ == "__main__":
+    graph.add('mining', mine, deps=[source_stage], inputs=source_inputs,
+              outputs=[RULES_FILE], params=mining_params)
+
+    return graph
+
+def run_pipeline(args):
+    """Orchestrates the data pipeline."""
+    graph = build_graph(args)
+    targets = STEP_TARGETS.get(args.step, [args.step])
+    from_stages = [args.from_stage] if args.from_stage else []
+
+    jobs = args.jobs
+    instrumentation.configure(metrics_file=args.metrics_file, profile=args.profile)
+    if args.profile and jobs > 1:
+        # cProfile/tracemalloc dumps are only meaningful one stage at a time
+        logger.info("Profiling enabled: running stages sequentially.")
+        jobs = 1
+
+    completed, failed = graph.run(
+        targets,
+        jobs=jobs,
+        # Single steps keep their old meaning: don't pull in upstream file stages
+        include_upstream=args.step == 'all',
+        from_stages=from_stages,
+        force=args.force,
+    )
+    if failed:
+        logger.warning(f"Failed stages: {', '.join(failed)}")
+    return completed, failed
+
+def build_parser():
+    stages = ['download', 'clean', 'load', 'classifier', 'regressor', 'plots', 'mining']
     parser = argparse.ArgumentParser(description="CrimeCastNYC Data Pipeline")
-    parser.add_argument("--step", choices=['download', 'clean', 'load', 'analyze', 'all'], default='all', help="Pipeline step to run")
+    parser.add_argument("--step", choices=list(STEP_TARGETS) + stages[3:], default='all', help="Pipeline step or stage to run")
     parser.add_argument("--start_year", type=int, default=2020, help="Start year for download")
     parser.add_argument("--end_year", type=int, default=2024, help="End year for download")
     parser.add_argument("--limit", type=int, help="Limit rows for download (testing)")
-    
-    args = parser.parse_args()
+    parser.add_argument("--plot_jobs", type=int, help="Worker processes for plot rendering (default: CPU count)")
+    parser.add_argument("--start_date", help="Analyze incidents on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--end_date", help="Analyze incidents before this date (YYYY-MM-DD, exclusive)")
+    parser.add_argument("--brin", action="store_true", help="Load step: use a BRIN index on incident_date (Postgres)")
+    parser.add_argument("--backend", choices=['db', 'parquet'], default='db', help="Read analysis data from the database or directly from data/processed")
+    parser.add_argument("--sample_fraction", type=float, help="Analyze a reproducible in-database sample of this fraction of rows")
+    parser.add_argument("--sample_size", type=int, help="Analyze a reproducible in-database sample of about this many rows")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for --sample_fraction / --sample_size")
+    parser.add_argument("--no_cache", action="store_true", help="Bypass the local query-result cache in data/cache")
+    parser.add_argument("--jobs", type=int, default=1, help="Maximum number of stages to run concurrently")
+    parser.add_argument("--from_stage", choices=stages, help="Rerun this stage and everything downstream of it")
+    parser.add_argument("--force", action="store_true", help="Rerun all selected stages even if their outputs are fresh")
+    parser.add_argument("--metrics_file", default=instrumentation.METRICS_FILE, help="JSON-lines file for per-stage metrics ('' to disable)")
+    parser.add_argument("--profile", action="store_true", help="Write cProfile and tracemalloc dumps per stage")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
     run_pipeline(args)
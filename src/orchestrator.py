@@ -0,0 +1,222 @@
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from src import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Parameters each stage last ran with, one JSON file per stage
+PARAMS_DIR = "data/.stages"
+
+class Stage:
+    """A pipeline stage: a callable plus the files it reads and writes.
+
+    `inputs` and `outputs` are lists of paths, or callables returning them
+    (evaluated lazily, since e.g. the cleaned files only exist after `clean`).
+    A stage with `outputs=None` is ephemeral: its result only lives in the
+    run context, so it runs whenever a downstream stage needs it. `params`
+    is a dict of the arguments that shape the outputs (e.g. a date range);
+    outputs produced with different params are stale.
+    """
+
+    def __init__(self, name, func, deps=(), inputs=None, outputs=None, params=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params
+
+    @property
+    def ephemeral(self):
+        return self.outputs is None
+
+    @staticmethod
+    def _resolve(paths):
+        if paths is None:
+            return []
+        if callable(paths):
+            paths = paths()
+        return list(paths)
+
+    def input_paths(self):
+        return self._resolve(self.inputs)
+
+    def output_paths(self):
+        return self._resolve(self.outputs)
+
+    @property
+    def params_path(self):
+        return os.path.join(PARAMS_DIR, f"{self.name}.json")
+
+    def _fingerprint(self):
+        return json.dumps(self.params, sort_keys=True, default=str)
+
+    def params_match(self):
+        """True if the outputs were produced with the current params."""
+        if self.params is None:
+            return True
+        try:
+            with open(self.params_path) as f:
+                return f.read() == self._fingerprint()
+        except FileNotFoundError:
+            return False
+
+    def record_params(self):
+        if self.params is None:
+            return
+        os.makedirs(PARAMS_DIR, exist_ok=True)
+        with open(self.params_path, "w") as f:
+            f.write(self._fingerprint())
+
+    def is_fresh(self):
+        """True if every output exists, was made with the current params and is newer than every input."""
+        if self.ephemeral:
+            return False
+        outputs = self.output_paths()
+        if not outputs or not all(os.path.exists(p) for p in outputs):
+            return False
+        if not self.params_match():
+            return False
+        inputs = self.input_paths()
+        if not all(os.path.exists(p) for p in inputs):
+            return False  # e.g. a load stamp removed by a load that did not finish
+        if not inputs:
+            return True
+        return min(os.path.getmtime(p) for p in outputs) >= max(os.path.getmtime(p) for p in inputs)
+
+class StageGraph:
+    """A DAG of stages with make-style freshness checks and concurrent execution."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, func, deps=(), inputs=None, outputs=None, params=None):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = Stage(name, func, deps, inputs, outputs, params)
+        return self.stages[name]
+
+    def _children(self):
+        children = {name: [] for name in self.stages}
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                children[dep].append(stage.name)
+        return children
+
+    def ancestors(self, names, ephemeral_only=False):
+        """Returns all upstream stages of `names` (optionally only through ephemeral stages)."""
+        seen = set()
+        stack = list(names)
+        while stack:
+            for dep in self.stages[stack.pop()].deps:
+                if dep in seen or (ephemeral_only and not self.stages[dep].ephemeral):
+                    continue
+                seen.add(dep)
+                stack.append(dep)
+        return seen
+
+    def descendants(self, name):
+        children = self._children()
+        seen = set()
+        stack = [name]
+        while stack:
+            for child in children[stack.pop()]:
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+
+    def plan(self, targets, include_upstream=True, from_stages=(), force=False):
+        """Returns the stages that need to run, in dependency order.
+
+        A stage runs if it is forced (`force`, or it is in / downstream of
+        `from_stages`), its outputs are stale, or an upstream stage runs.
+        Ephemeral stages are added back whenever a stage that needs them runs.
+        """
+        for name in list(targets) + list(from_stages):
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'")
+
+        selected = set(targets) | self.ancestors(targets, ephemeral_only=not include_upstream)
+        forced = set(self.stages) if force else set()
+        all_ancestors = self.ancestors(targets)
+        for name in from_stages:
+            downstream = self.descendants(name)
+            forced |= {name} | downstream
+            # Rerunning from an upstream stage pulls in the path down to the targets
+            if name in all_ancestors:
+                selected |= {name} | (downstream & all_ancestors)
+
+        order = [name for name in self.stages if name in selected]
+        dirty = set()
+        for name in order:
+            stage = self.stages[name]
+            upstream_dirty = any(dep in dirty for dep in stage.deps)
+            if name in forced or upstream_dirty or (not stage.ephemeral and not stage.is_fresh()):
+                if stage.ephemeral and name not in forced and not upstream_dirty:
+                    continue  # Only needed if a dependant runs; handled below
+                dirty.add(name)
+
+        children = self._children()
+        for name in reversed(order):
+            if name not in dirty and self.stages[name].ephemeral:
+                if any(child in dirty for child in children[name] if child in selected):
+                    dirty.add(name)
+
+        return [name for name in order if name in dirty]
+
+    def run(self, targets, jobs=1, include_upstream=True, from_stages=(), force=False, context=None):
+        """Runs the planned stages, at most `jobs` at a time.
+
+        Each stage function receives the shared `context` dict; its return
+        value is stored under the stage name. A failed stage stops its
+        dependants but not unrelated stages. Returns (completed, failed).
+        """
+        context = {} if context is None else context
+        planned = self.plan(targets, include_upstream, from_stages, force)
+        skipped = [name for name in self.stages if name in set(targets) and name not in planned]
+        for name in skipped:
+            logger.info(f"Stage '{name}' is up to date. Skipping.")
+        if not planned:
+            return [], []
+
+        logger.info(f"Running stages: {', '.join(planned)} (jobs={jobs})")
+        pending = list(planned)
+        completed, failed = [], []
+        running = {}
+
+        def _execute(stage):
+            logger.info(f"Starting stage '{stage.name}'...")
+            with instrumentation.track(stage.name):
+                context[stage.name] = stage.func(context)
+            stage.record_params()
+            logger.info(f"Finished stage '{stage.name}'.")
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            while pending or running:
+                for name in list(pending):
+                    deps = [d for d in self.stages[name].deps if d in planned]
+                    if any(d in failed for d in deps):
+                        logger.warning(f"Skipping stage '{name}': an upstream stage failed.")
+                        pending.remove(name)
+                        failed.append(name)
+                    elif all(d in completed for d in deps) and len(running) < max(1, jobs):
+                        pending.remove(name)
+                        running[executor.submit(_execute, self.stages[name])] = name
+
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        completed.append(name)
+                    except Exception as e:
+                        logger.error(f"Stage '{name}' failed: {e}")
+                        failed.append(name)
+
+        return completed, failed
@@ -0,0 +1,55 @@
+import numpy as np
+
+# NYC bounding box: (lon_min, lon_max, lat_min, lat_max)
+NYC_BOUNDS = (-74.26, -73.69, 40.49, 40.92)
+CELL_SIZE_M = 250
+
+# Equirectangular projection around NYC: accurate to well under 1% inside the box
+M_PER_DEG_LAT = 111_320.0
+M_PER_DEG_LON = M_PER_DEG_LAT * np.cos(np.radians((NYC_BOUNDS[2] + NYC_BOUNDS[3]) / 2))
+
+def to_meters(lat, lon):
+    """Projects lat/lon to planar (x, y) metres from the south-west corner of NYC_BOUNDS."""
+    x = (np.asarray(lon, dtype=float) - NYC_BOUNDS[0]) * M_PER_DEG_LON
+    y = (np.asarray(lat, dtype=float) - NYC_BOUNDS[2]) * M_PER_DEG_LAT
+    return x, y
+
+def to_latlon(x, y):
+    """Inverse of `to_meters`."""
+    lon = np.asarray(x, dtype=float) / M_PER_DEG_LON + NYC_BOUNDS[0]
+    lat = np.asarray(y, dtype=float) / M_PER_DEG_LAT + NYC_BOUNDS[2]
+    return lat, lon
+
+def grid_shape(cell_size_m=CELL_SIZE_M):
+    """Returns (rows, cols) of the grid covering NYC_BOUNDS."""
+    width = (NYC_BOUNDS[1] - NYC_BOUNDS[0]) * M_PER_DEG_LON
+    height = (NYC_BOUNDS[3] - NYC_BOUNDS[2]) * M_PER_DEG_LAT
+    return int(np.ceil(height / cell_size_m)), int(np.ceil(width / cell_size_m))
+
+def cells_from_meters(x, y, cell_size_m=CELL_SIZE_M):
+    """Maps planar coordinates to row-major cell ids; -1 for points outside the grid."""
+    rows, cols = grid_shape(cell_size_m)
+    col = np.floor(np.asarray(x, dtype=float) / cell_size_m)
+    row = np.floor(np.asarray(y, dtype=float) / cell_size_m)
+    # NaN coordinates compare False and end up outside
+    inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+    cells = np.full(col.shape, -1, dtype=np.int32)
+    cells[inside] = (row[inside] * cols + col[inside]).astype(np.int32)
+    return cells
+
+def assign_grid_cell(lat, lon, cell_size_m=CELL_SIZE_M):
+    """Assigns every point the id of the grid cell containing it (vectorized).
+
+    Cells are `cell_size_m` squares over NYC_BOUNDS numbered row-major from the
+    south-west corner. Points outside the box or without coordinates get -1.
+    """
+    x, y = to_meters(lat, lon)
+    return cells_from_meters(x, y, cell_size_m)
+
+def cell_center(cells, cell_size_m=CELL_SIZE_M):
+    """Returns the (lat, lon) centre of each cell id."""
+    _, cols = grid_shape(cell_size_m)
+    cells = np.asarray(cells)
+    x = (cells % cols + 0.5) * cell_size_m
+    y = (cells // cols + 0.5) * cell_size_m
+    return to_latlon(x, y)
@@ -0,0 +1,97 @@
+import numpy as np
+from src.spatial.grid import CELL_SIZE_M, grid_shape, to_meters, cells_from_meters
+
+class GridIndex:
+    """In-memory uniform-grid index for radius and k-nearest queries.
+
+    Points are sorted by cell so that every grid row of a query window is one
+    contiguous slice; a query only touches the cells overlapping its search
+    area, independent of the total number of points.
+    """
+
+    def __init__(self, lat, lon, times=None, cell_size_m=CELL_SIZE_M):
+        self.cell_size_m = cell_size_m
+        self.rows, self.cols = grid_shape(cell_size_m)
+
+        x, y = to_meters(lat, lon)
+        cells = cells_from_meters(x, y, cell_size_m)
+        valid = np.flatnonzero(cells >= 0)
+        order = valid[np.argsort(cells[valid], kind='stable')]
+
+        # Positions into the caller's arrays, grouped by cell
+        self.ids = order
+        self.x = x[order]
+        self.y = y[order]
+        self.times = None if times is None else np.asarray(times, dtype='datetime64[ns]')[order]
+        # offsets[c]:offsets[c + 1] is the slice of points in cell c
+        self.offsets = np.searchsorted(cells[order], np.arange(self.rows * self.cols + 1))
+
+    @classmethod
+    def from_frame(cls, df, time_col='incident_date', cell_size_m=CELL_SIZE_M):
+        times = df[time_col].to_numpy() if time_col and time_col in df.columns else None
+        return cls(df['latitude'].to_numpy(), df['longitude'].to_numpy(), times, cell_size_m)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _window(self, x, y, reach_m):
+        """Returns sorted-array positions of points in cells within `reach_m` of (x, y)."""
+        c0 = max(int((x - reach_m) // self.cell_size_m), 0)
+        c1 = min(int((x + reach_m) // self.cell_size_m), self.cols - 1)
+        r0 = max(int((y - reach_m) // self.cell_size_m), 0)
+        r1 = min(int((y + reach_m) // self.cell_size_m), self.rows - 1)
+        if c0 > c1 or r0 > r1:
+            return np.empty(0, dtype=np.intp)
+        slices = [
+            np.arange(self.offsets[r * self.cols + c0], self.offsets[r * self.cols + c1 + 1])
+            for r in range(r0, r1 + 1)
+        ]
+        return np.concatenate(slices)
+
+    def _time_mask(self, pos, start, end):
+        if self.times is None or (start is None and end is None):
+            return np.ones(len(pos), dtype=bool)
+        t = self.times[pos]
+        mask = np.ones(len(pos), dtype=bool)
+        if start is not None:
+            mask &= t >= np.datetime64(start, 'ns')
+        if end is not None:
+            mask &= t < np.datetime64(end, 'ns')
+        return mask
+
+    def query_radius(self, lat, lon, radius_m, start=None, end=None, return_distance=False):
+        """Returns positions (into the input arrays) of points within `radius_m` of lat/lon.
+
+        `start`/`end` optionally restrict to points with start <= time < end,
+        e.g. calls within 500 m in the last week.
+        """
+        x, y = to_meters(lat, lon)
+        x, y = float(x), float(y)
+        pos = self._window(x, y, radius_m)
+        dist = np.hypot(self.x[pos] - x, self.y[pos] - y)
+        keep = (dist <= radius_m) & self._time_mask(pos, start, end)
+        pos, dist = pos[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        if return_distance:
+            return self.ids[pos[order]], dist[order]
+        return self.ids[pos[order]]
+
+    def query_knn(self, lat, lon, k, start=None, end=None):
+        """Returns (positions, distances in metres) of the `k` nearest points to lat/lon.
+
+        Grows the search window ring by ring until it holds `k` points that are
+        guaranteed to be nearer than anything outside it.
+        """
+        x, y = to_meters(lat, lon)
+        x, y = float(x), float(y)
+        max_reach = np.hypot(self.rows, self.cols) * self.cell_size_m
+        reach = self.cell_size_m
+        while True:
+            pos = self._window(x, y, reach)
+            pos = pos[self._time_mask(pos, start, end)]
+            dist = np.hypot(self.x[pos] - x, self.y[pos] - y)
+            # Only points within `reach` are certain to beat unseen ones outside the window
+            if np.count_nonzero(dist <= reach) >= k or reach >= max_reach:
+                order = np.argsort(dist, kind='stable')[:k]
+                return self.ids[pos[order]], dist[order]
+            reach *= 2
@@ -1,112 +1,469 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
 import os
+import json
+import hashlib
+import pickle
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src import instrumentation
+from src.spatial.grid import NYC_BOUNDS
 
 OUTPUT_DIR = "data/output/plots"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+TILE_DIR = "data/output/tiles"
 
-def plot_association_rules(rules_df):
-    """Generates a heatmap of Association Rules by Lift."""
-    if rules_df.empty:
-        print("No rules to plot.")
-        return
+DENSITY_BINS = (400, 400)  # (rows, cols) of the density raster
+
+# Stores the input hash of every rendered plot so unchanged plots are skipped
+MANIFEST_FILE = ".render_manifest.json"
+_manifest_lock = threading.Lock()
+# pyplot keeps global state; serializes plots rendered in this process
+_pyplot_lock = threading.Lock()
 
+def _pyplot():
+    """Imports pyplot on first use with the headless Agg backend.
+
+    matplotlib and seaborn are only needed once something is drawn, so they
+    are not imported with this module.
+    """
+    import matplotlib
+    matplotlib.use("Agg")  # Headless backend: safe in worker processes and servers
+    import matplotlib.pyplot as plt
+    return plt
+
+def _output_path(filename):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, filename)
+
+# --- Renderers ---------------------------------------------------------------
+# Each renderer draws one plot from its pre-computed aggregate and saves it to
+# `path`. They never see the raw DataFrame, so they are cheap to pickle and run
+# in worker processes.
+
+def _render_association_rules(rules_df, path):
+    plt = _pyplot()
+    import seaborn as sns
     plt.figure(figsize=(14, 10))
     # Pivot for Heatmap: Antecedent vs Consequent, value=Lift
     # Filter top 20 rules by lift to avoid overcrowding
     top_rules = rules_df.head(20)
     pivot = top_rules.pivot(index='antecedent', columns='consequent', values='lift')
-    
+
     sns.heatmap(pivot, annot=True, cmap='coolwarm', fmt=".2f")
     plt.title("Top Association Rules (Lift Metric)")
     plt.xlabel("Consequent (Then)")
     plt.ylabel("Antecedent (If)")
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/association_rules_lift.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_heatmap(df):
-    """Generates a heatmap of crime frequency by Hour and Day of Week."""
+def _render_heatmap(pivot, path):
+    plt = _pyplot()
+    import seaborn as sns
     plt.figure(figsize=(12, 6))
-    pivot = df.pivot_table(index='day_of_week', columns='hour', aggfunc='size', fill_value=0)
     sns.heatmap(pivot, cmap='Reds', linewidths=0.5)
     plt.title("Crime Frequency Heatmap (Day vs Hour)")
     plt.xlabel("Hour of Day")
     plt.ylabel("Day of Week (0=Monday, 6=Sunday)")
-    plt.savefig(f"{OUTPUT_DIR}/heatmap_day_hour.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_incident_trends(df, label):
-    """Generates a time-series plot of incident volume."""
-    # Ensure incident_date is datetime
-    df['incident_date'] = pd.to_datetime(df['incident_date'])
-    daily_counts = df.groupby('incident_date').size()
-    
+def _render_incident_trends(agg, path):
+    plt = _pyplot()
+    daily_counts, label = agg
     plt.figure(figsize=(14, 7))
     daily_counts.plot(kind='line', color='blue')
     plt.title(f"Daily Incident Trends - {label}")
     plt.xlabel("Date")
     plt.ylabel("Number of Incidents")
     plt.grid(True)
-    plt.savefig(f"{OUTPUT_DIR}/incident_trends.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_crime_by_borough(df):
-    """Generates a bar chart of crimes by borough."""
+def _render_crime_by_borough(counts, path):
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
-    df['borough'].value_counts().plot(kind='bar', color='teal')
+    counts.plot(kind='bar', color='teal')
     plt.title("Crime Distribution by Borough")
     plt.xlabel("Borough")
     plt.ylabel("Count")
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/crime_by_borough.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_top_crime_types(df, n=15):
-    """Generates a horizontal bar chart of top N crime types."""
+def _render_top_crime_types(top_crimes, path):
+    plt = _pyplot()
     plt.figure(figsize=(12, 8))
-    top_crimes = df['complaint_type'].value_counts().head(n).sort_values()
     top_crimes.plot(kind='barh', color='purple')
-    plt.title(f"Top {n} Crime Types")
+    plt.title(f"Top {len(top_crimes)} Crime Types")
     plt.xlabel("Count")
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/top_{n}_crime_types.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_hourly_distribution(df):
-    """Generates a line plot of average crime by hour."""
+def _render_hourly_distribution(hourly, path):
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
-    hourly = df.groupby('hour').size()
     hourly.plot(kind='line', marker='o', color='darkorange')
     plt.title("Total Hourly Crime Distribution")
     plt.xlabel("Hour of Day (0-23)")
     plt.ylabel("Total Incidents")
     plt.grid(True)
     plt.xticks(range(0, 24))
-    plt.savefig(f"{OUTPUT_DIR}/hourly_distribution.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_spatial_scatter(df):
-    """Generates a scatter plot of crime locations (latitude/longitude)."""
+def _render_spatial_scatter(valid_df, path):
+    plt = _pyplot()
+    import seaborn as sns
     plt.figure(figsize=(10, 10))
-    # Filter out potential bad lat/long data (0,0) or outside NYC approx bounds
-    valid_df = df[(df['latitude'] > 40) & (df['latitude'] < 41) & (df['longitude'] > -74.3) & (df['longitude'] < -73.6)]
     sns.scatterplot(x='longitude', y='latitude', data=valid_df, hue='borough', alpha=0.3, s=10)
     plt.title("Spatial Distribution of Incidents")
     plt.xlabel("Longitude")
     plt.ylabel("Latitude")
     plt.legend(markerscale=2)
-    plt.savefig(f"{OUTPUT_DIR}/spatial_scatter.png")
+    plt.savefig(path)
     plt.close()
 
-def plot_priority_distribution(df):
-    """Generates a pie chart of High vs Low priority crimes."""
+def _render_spatial_density(agg, path):
+    plt = _pyplot()
+    from matplotlib.colors import LogNorm
+    layers, names, bounds, log_scale = agg
+    # Small multiples: the citywide total followed by one layer per borough
+    panels = [("ALL", layers.sum(axis=0))]
+    if len(names) > 1:
+        panels += list(zip(names, layers))
+
+    ncols = min(len(panels), 3)
+    nrows = -(-len(panels) // ncols)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(6 * ncols, 6 * nrows), squeeze=False)
+    for ax, (name, grid) in zip(axes.flat, panels):
+        masked = np.ma.masked_equal(grid, 0)
+        norm = LogNorm(vmin=1, vmax=max(grid.max(), 1)) if log_scale else None
+        im = ax.imshow(masked, origin='lower', extent=bounds, cmap='inferno', norm=norm,
+                       interpolation='nearest', aspect='auto')
+        ax.set_title(name)
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        fig.colorbar(im, ax=ax, label="Incidents per cell")
+    for ax in list(axes.flat)[len(panels):]:
+        ax.axis('off')
+
+    fig.suptitle("Spatial Density of Incidents")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+def _render_priority_distribution(counts, path):
+    plt = _pyplot()
     plt.figure(figsize=(8, 8))
-    counts = df['is_high_priority'].value_counts()
     labels = ['Low Priority', 'High Priority'] if len(counts) == 2 else counts.index
     plt.pie(counts, labels=labels, autopct='%1.1f%%', colors=['skyblue', 'salmon'], startangle=140)
     plt.title("High vs Low Priority Crime Distribution")
-    plt.savefig(f"{OUTPUT_DIR}/priority_distribution.png")
+    plt.savefig(path)
     plt.close()
+
+# Plot name -> (renderer, output filename)
+RENDERERS = {
+    'heatmap': (_render_heatmap, "heatmap_day_hour.png"),
+    'incident_trends': (_render_incident_trends, "incident_trends.png"),
+    'crime_by_borough': (_render_crime_by_borough, "crime_by_borough.png"),
+    'top_crime_types': (_render_top_crime_types, "top_{n}_crime_types.png"),
+    'hourly_distribution': (_render_hourly_distribution, "hourly_distribution.png"),
+    'spatial_scatter': (_render_spatial_scatter, "spatial_scatter.png"),
+    'spatial_density': (_render_spatial_density, "spatial_density.png"),
+    'priority_distribution': (_render_priority_distribution, "priority_distribution.png"),
+    'association_rules': (_render_association_rules, "association_rules_lift.png"),
+}
+
+# --- Aggregates --------------------------------------------------------------
+
+def _valid_locations(df):
+    # Filter out potential bad lat/long data (0,0) or outside NYC approx bounds
+    return df.loc[
+        (df['latitude'] > 40) & (df['latitude'] < 41) & (df['longitude'] > -74.3) & (df['longitude'] < -73.6),
+        ['longitude', 'latitude', 'borough']
+    ]
+
+def _bin_points(x, y, x_range, y_range, shape, groups=None, n_groups=1):
+    """Counts points into a fixed (rows, cols) grid with a single bincount.
+
+    `groups` optionally assigns each point to a layer, producing an array of
+    shape (n_groups, rows, cols). Points outside the ranges or with NaN
+    coordinates are dropped.
+    """
+    rows, cols = shape
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = (x >= x_range[0]) & (x < x_range[1]) & (y >= y_range[0]) & (y < y_range[1])
+
+    col = ((x[mask] - x_range[0]) * (cols / (x_range[1] - x_range[0]))).astype(np.intp)
+    row = ((y[mask] - y_range[0]) * (rows / (y_range[1] - y_range[0]))).astype(np.intp)
+    np.minimum(col, cols - 1, out=col)
+    np.minimum(row, rows - 1, out=row)
+
+    flat = row * cols + col
+    if groups is not None:
+        flat += np.asarray(groups)[mask] * (rows * cols)
+    counts = np.bincount(flat, minlength=n_groups * rows * cols)
+    return counts.reshape(n_groups, rows, cols)
+
+def compute_spatial_density(df, bins=DENSITY_BINS, bounds=NYC_BOUNDS, by_borough=True, log_scale=True):
+    """Bins incident coordinates into a fixed raster over the NYC bounding box.
+
+    Returns the aggregate consumed by the `spatial_density` renderer:
+    (layers, layer_names, bounds, log_scale), where `layers` has one grid per
+    borough (or a single grid when `by_borough` is False).
+    """
+    if by_borough:
+        codes, names = pd.factorize(df['borough'], sort=True)
+        # Rows with a missing borough (-1) still count towards the total
+        missing = codes < 0
+        if missing.any():
+            codes = np.where(missing, len(names), codes)
+            names = list(names) + ["UNKNOWN"]
+        names = list(names)
+    else:
+        codes, names = None, ["ALL"]
+
+    layers = _bin_points(
+        df['longitude'].to_numpy(), df['latitude'].to_numpy(),
+        bounds[:2], bounds[2:], bins, groups=codes, n_groups=len(names),
+    )
+    return layers, names, tuple(bounds), log_scale
+
+def compute_aggregates(df, label, n=15, spatial_mode='density'):
+    """Computes the inputs of every incident plot in a single call.
+
+    The caller's DataFrame is never modified. The hourly distribution is
+    derived from the day/hour heatmap instead of re-grouping the full frame.
+    `spatial_mode` selects the raster density plot ('density') or the
+    per-point scatter ('points').
+    """
+    heatmap = pd.crosstab(df['day_of_week'], df['hour'])
+    # Parse dates on a copy of the column; do not touch the caller's frame
+    dates = pd.to_datetime(df['incident_date'])
+
+    aggregates = {
+        'heatmap': heatmap,
+        'incident_trends': (dates.value_counts().sort_index(), label),
+        'crime_by_borough': df['borough'].value_counts(),
+        'top_crime_types': df['complaint_type'].value_counts().head(n).sort_values(),
+        'hourly_distribution': heatmap.sum(axis=0),
+        'priority_distribution': df['is_high_priority'].value_counts(),
+    }
+    if spatial_mode == 'points':
+        aggregates['spatial_scatter'] = _valid_locations(df)
+    else:
+        aggregates['spatial_density'] = compute_spatial_density(df)
+    return aggregates
+
+def _aggregate_hash(agg):
+    """Returns a stable content hash of a plot's input aggregate."""
+    hasher = hashlib.sha1()
+    parts = agg if isinstance(agg, tuple) else (agg,)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            hasher.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+            names = part.columns if isinstance(part, pd.DataFrame) else [part.name]
+            hasher.update(repr(list(names)).encode())
+            hasher.update(repr(list(part.index.names)).encode())
+        else:
+            hasher.update(pickle.dumps(part))
+    return hasher.hexdigest()
+
+def _load_manifest():
+    path = os.path.join(OUTPUT_DIR, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest):
+    path = _output_path(MANIFEST_FILE)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def _render(name, agg, path):
+    """Worker entry point: renders a single plot."""
+    renderer, _ = RENDERERS[name]
+    renderer(agg, path)
+    return name
+
+def render_plots(aggregates, jobs=None, force=False, n=15):
+    """Renders plots from pre-computed aggregates in a process pool.
+
+    Plots whose aggregate hash matches the last render (and whose file still
+    exists) are skipped unless `force` is set. A single plot (or jobs=1) is
+    rendered in-process. Workers are spawned rather than forked, since the
+    pipeline calls this from stage threads. Returns the names of the plots
+    that were rendered.
+    """
+    manifest = _load_manifest()
+    pending = {}
+    for name, agg in aggregates.items():
+        filename = RENDERERS[name][1].format(n=n)
+        path = _output_path(filename)
+        digest = _aggregate_hash(agg)
+        if not force and manifest.get(filename) == digest and os.path.exists(path):
+            print(f"Skipping {filename}: input unchanged.")
+            # Marks the plot as up to date for mtime-based freshness checks
+            os.utime(path)
+            continue
+        pending[name] = (agg, path, filename, digest)
+
+    if not pending:
+        return []
+
+    rendered = {}
+    with instrumentation.track("render_plots", plots=len(pending)) as metrics:
+        if len(pending) == 1 or jobs == 1:
+            for name, (agg, path, filename, digest) in pending.items():
+                try:
+                    with _pyplot_lock:
+                        _render(name, agg, path)
+                except Exception as e:
+                    print(f"Error rendering {filename}: {e}")
+                    continue
+                rendered[name] = (filename, digest)
+                metrics.add_written(path)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = {
+                    executor.submit(_render, name, agg, path): name
+                    for name, (agg, path, _, _) in pending.items()
+                }
+                for future in as_completed(futures):
+                    name = futures[future]
+                    _, path, filename, digest = pending[name]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Error rendering {filename}: {e}")
+                        continue
+                    rendered[name] = (filename, digest)
+                    metrics.add_written(path)
+
+    # Re-read under the lock so concurrent callers don't drop each other's entries
+    with _manifest_lock:
+        manifest = _load_manifest()
+        manifest.update(dict(rendered.values()))
+        _save_manifest(manifest)
+    return list(rendered)
+
+def plot_paths(n=15, spatial_mode='density'):
+    """Returns the output paths `render_all` writes for these options."""
+    spatial = 'spatial_scatter' if spatial_mode == 'points' else 'spatial_density'
+    names = ['heatmap', 'incident_trends', 'crime_by_borough', 'top_crime_types',
+             'hourly_distribution', spatial, 'priority_distribution']
+    return [os.path.join(OUTPUT_DIR, RENDERERS[name][1].format(n=n)) for name in names]
+
+def render_all(df, label, jobs=None, force=False, n=15, spatial_mode='density'):
+    """Computes all incident aggregates once and renders the plots in parallel."""
+    with instrumentation.track("compute_aggregates") as metrics:
+        aggregates = compute_aggregates(df, label, n=n, spatial_mode=spatial_mode)
+        metrics.add_rows(len(df))
+    return render_plots(aggregates, jobs=jobs, force=force, n=n)
+
+# --- Single-plot API ---------------------------------------------------------
+
+def plot_association_rules(rules_df):
+    """Generates a heatmap of Association Rules by Lift."""
+    if rules_df.empty:
+        print("No rules to plot.")
+        return
+    render_plots({'association_rules': rules_df})
+
+def plot_heatmap(df):
+    """Generates a heatmap of crime frequency by Hour and Day of Week."""
+    _render_heatmap(pd.crosstab(df['day_of_week'], df['hour']), _output_path("heatmap_day_hour.png"))
+
+def plot_incident_trends(df, label):
+    """Generates a time-series plot of incident volume."""
+    daily_counts = pd.to_datetime(df['incident_date']).value_counts().sort_index()
+    _render_incident_trends((daily_counts, label), _output_path("incident_trends.png"))
+
+def plot_crime_by_borough(df):
+    """Generates a bar chart of crimes by borough."""
+    _render_crime_by_borough(df['borough'].value_counts(), _output_path("crime_by_borough.png"))
+
+def plot_top_crime_types(df, n=15):
+    """Generates a horizontal bar chart of top N crime types."""
+    top_crimes = df['complaint_type'].value_counts().head(n).sort_values()
+    _render_top_crime_types(top_crimes, _output_path(f"top_{n}_crime_types.png"))
+
+def plot_hourly_distribution(df):
+    """Generates a line plot of average crime by hour."""
+    _render_hourly_distribution(df.groupby('hour').size(), _output_path("hourly_distribution.png"))
+
+def plot_spatial_scatter(df):
+    """Generates a scatter plot of crime locations (latitude/longitude)."""
+    _render_spatial_scatter(_valid_locations(df), _output_path("spatial_scatter.png"))
+
+def plot_spatial_density(df, bins=DENSITY_BINS, by_borough=True, log_scale=True):
+    """Generates a rasterized density map of crime locations, optionally per borough."""
+    agg = compute_spatial_density(df, bins=bins, by_borough=by_borough, log_scale=log_scale)
+    _render_spatial_density(agg, _output_path("spatial_density.png"))
+
+def plot_priority_distribution(df):
+    """Generates a pie chart of High vs Low priority crimes."""
+    _render_priority_distribution(df['is_high_priority'].value_counts(), _output_path("priority_distribution.png"))
+
+# --- Map tiles ---------------------------------------------------------------
+
+def _mercator_pixels(lon, lat, zoom, tile_size):
+    """Projects lon/lat to global Web Mercator pixel coordinates at `zoom`."""
+    world = tile_size * (2 ** zoom)
+    lat_rad = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * world
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * world
+    return x, y
+
+def export_density_tiles(df, out_dir=TILE_DIR, zooms=(10, 11, 12), tile_size=256, log_scale=True, cmap='inferno'):
+    """Exports the incident density as slippy-map PNG tiles (`{z}/{x}/{y}.png`).
+
+    For each zoom level the points are binned once into a pixel raster covering
+    the tiles that intersect NYC_BOUNDS, which is then cut into tiles. Empty
+    tiles are not written. Returns the number of tiles written.
+    """
+    lon_min, lon_max, lat_min, lat_max = NYC_BOUNDS
+    plt = _pyplot()
+    colormap = plt.get_cmap(cmap)
+    written = 0
+
+    for zoom in zooms:
+        (x0, x1), (y0, y1) = _mercator_pixels([lon_min, lon_max], [lat_max, lat_min], zoom, tile_size)
+        tx_min, tx_max = int(x0 // tile_size), int(x1 // tile_size)
+        ty_min, ty_max = int(y0 // tile_size), int(y1 // tile_size)
+        px0, py0 = tx_min * tile_size, ty_min * tile_size
+        cols = (tx_max - tx_min + 1) * tile_size
+        rows = (ty_max - ty_min + 1) * tile_size
+
+        x, y = _mercator_pixels(df['longitude'].to_numpy(), df['latitude'].to_numpy(), zoom, tile_size)
+        grid = _bin_points(x, y, (px0, px0 + cols), (py0, py0 + rows), (rows, cols))[0]
+
+        peak = grid.max()
+        if peak == 0:
+            continue
+        scaled = np.log1p(grid) / np.log1p(peak) if log_scale else grid / peak
+        rgba = colormap(scaled)
+        rgba[..., 3] = np.where(grid > 0, 0.85, 0.0)
+
+        for ty in range(ty_min, ty_max + 1):
+            for tx in range(tx_min, tx_max + 1):
+                r0 = (ty - ty_min) * tile_size
+                c0 = (tx - tx_min) * tile_size
+                if not grid[r0:r0 + tile_size, c0:c0 + tile_size].any():
+                    continue
+                tile_path = os.path.join(out_dir, str(zoom), str(tx))
+                os.makedirs(tile_path, exist_ok=True)
+                plt.imsave(os.path.join(tile_path, f"{ty}.png"), rgba[r0:r0 + tile_size, c0:c0 + tile_size])
+                written += 1
+
+    print(f"Wrote {written} density tiles to {out_dir}")
+    return written